@@ -0,0 +1,84 @@
+"""Micro-benchmark of building and rendering ``ph_container``/``ph_artifact`` objects, without any requests.
+
+Reports the time to construct and to render (``render_dictionary()``) ``--count`` artifacts spread over
+containers of ``--artifacts`` each, and the python memory they hold (tracemalloc).
+
+Example:
+    Compare construction and render cost between two branches::
+
+        python benchmarks/bench_models.py --count 100000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from phantom_api.ph_events import ph_artifact, ph_container
+
+def build(count, artifacts_per_container):
+    containers = []
+    for container_num in range(count // artifacts_per_container):
+        containers.append(ph_container(
+            'benchmark',
+            'benchmark container ' + str(container_num),
+            severity='high',
+            sensitivity='red',
+            kill_chain='Delivery',
+            source_data_identifier='bench-' + str(container_num),
+            artifacts=[
+                ph_artifact(
+                    {'sourceAddress': '10.0.0.' + str(artifact_num % 255)},
+                    None,
+                    'benchmark',
+                    severity='low',
+                    kill_chain='Exploitation',
+                    source_data_identifier='artifact-' + str(artifact_num)
+                )
+                for artifact_num in range(artifacts_per_container)
+            ]
+        ))
+
+    return containers
+
+def render(containers):
+    for container in containers:
+        container.render_dictionary()
+
+def main():
+    parser = argparse.ArgumentParser(description='ph_container/ph_artifact construction and render benchmark.')
+    parser.add_argument('--count', type=int, default=100000, help='number of artifacts')
+    parser.add_argument('--artifacts', type=int, default=100, help='artifacts per container')
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs')
+    args = parser.parse_args()
+
+    build_seconds = []
+    render_seconds = []
+    for _ in range(args.repeat):
+        gc.collect()
+        start = time.time()
+        containers = build(args.count, args.artifacts)
+        build_seconds.append(time.time() - start)
+
+        start = time.time()
+        render(containers)
+        render_seconds.append(time.time() - start)
+        del containers
+
+    gc.collect()
+    tracemalloc.start()
+    containers = build(args.count, args.artifacts)
+    held_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('artifacts:  ' + str(args.count))
+    print('build:      %.3f s' % min(build_seconds))
+    print('render:     %.3f s' % min(render_seconds))
+    print('memory:     %.1f MB' % (held_memory / 1024.0 / 1024.0))
+
+if __name__ == '__main__':
+    main()
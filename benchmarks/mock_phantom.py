@@ -0,0 +1,372 @@
+"""A small, in-memory stand-in for the phantom REST API, used by the benchmarks.
+
+It implements just enough of the API for the phantom_api package to run against it:
+
+- ``/rest/<record_type>`` list queries with ``page``/``page_size``/``sort``/``order`` and
+  ``_filter_<field>__<type>`` filters (exact, iexact, in, gt, gte, lt, lte, contains, icontains)
+- ``/rest/<record_type>/<id>`` get, update (POST) and delete, ``/rest/container/<id>/artifacts``
+- container and artifact creation (single, list, and artifacts embedded in a container) with
+  phantom's duplicate responses for ``source_data_identifier``
+- ``/rest/action_run`` and ``/rest/playbook_run``, which complete ``run_duration`` seconds after launch
+  and create ``app_run`` records for each action target
+- ``/rest/decided_list`` create, read and update
+
+Every request sleeps ``latency`` seconds. List queries additionally sleep ``offset_latency`` seconds
+per 1000 records skipped by ``page``, to mimic deep offsets getting slower on a real server.
+
+Run standalone with ``python benchmarks/mock_phantom.py --port 8443 --latency 0.005 --preload-containers 10000``.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlparse
+
+_PATH_RE = re.compile(r'^/rest/(?P<record_type>\w+)(?:/(?P<record_id>[^/]+))?(?:/(?P<detail>\w+))?/?$')
+
+_RUN_TYPES = ('action_run', 'playbook_run')
+
+class mock_phantom_state(object):
+    """Records held by the mock server, shared by all request threads.
+
+    Keyword Args:
+        latency (float): seconds every request sleeps before responding.
+        offset_latency (float): extra seconds per 1000 records skipped by ``page`` on list queries.
+        run_duration (float): seconds after launch at which action and playbook runs complete.
+    """
+
+    def __init__(self, latency=0.0, offset_latency=0.0, run_duration=0.0):
+        self.latency = latency
+        self.offset_latency = offset_latency
+        self.run_duration = run_duration
+        self.lock = threading.Lock()
+        self.records = {}
+        self.next_ids = {}
+        self.request_count = 0
+
+    def new_id(self, record_type):
+        self.next_ids[record_type] = self.next_ids.get(record_type, 0) + 1
+        return self.next_ids[record_type]
+
+    def table(self, record_type):
+        return self.records.setdefault(record_type, {})
+
+    def add_containers(self, count, label='events', artifacts_per_container=0):
+        """Bulk loads records directly, without going through http. Useful for setting up query scenarios."""
+
+        with self.lock:
+            for _ in range(count):
+                container = self._create_container({'label': label, 'name': 'preloaded', 'status': 'new'})
+                for _ in range(artifacts_per_container):
+                    self._create_artifact({'container_id': container['id'], 'label': label, 'cef': {}})
+
+    def refresh_run(self, record_type, run):
+        if run['status'] == 'running' and time.time() - run['_launched'] >= self.run_duration:
+            run['status'] = 'success'
+            for app_run in self.table('app_run').values():
+                if app_run.get('action_run_id') == run['id']:
+                    app_run['status'] = 'success'
+
+    def _create_container(self, data):
+        containers = self.table('container')
+        sdi = data.get('source_data_identifier')
+        if sdi:
+            for container in containers.values():
+                if container.get('source_data_identifier') == sdi:
+                    return {
+                        'failed': True,
+                        'message': 'duplicate with source_data_identifier',
+                        'existing_container_id': container['id']
+                    }
+
+        embedded_artifacts = data.pop('artifacts', None) or []
+        container = dict(data, id=self.new_id('container'))
+        containers[container['id']] = container
+        for artifact in embedded_artifacts:
+            self._create_artifact(dict(artifact, container_id=container['id']))
+
+        return {'success': True, 'id': container['id']}
+
+    def _create_artifact(self, data):
+        artifacts = self.table('artifact')
+        sdi = data.get('source_data_identifier')
+        if sdi:
+            for artifact in artifacts.values():
+                if artifact.get('container_id') == data.get('container_id') and artifact.get('source_data_identifier') == sdi:
+                    return {
+                        'failed': True,
+                        'message': 'artifact already exists',
+                        'existing_artifact_id': artifact['id']
+                    }
+
+        artifact = dict(data, id=self.new_id('artifact'))
+        artifacts[artifact['id']] = artifact
+
+        return {'success': True, 'id': artifact['id']}
+
+    def create(self, record_type, data):
+        if record_type == 'container':
+            return self._create_container(data)
+        if record_type == 'artifact':
+            return self._create_artifact(data)
+
+        record = dict(data, id=self.new_id(record_type))
+        if record_type == 'action_run':
+            record.update(status='running', _launched=time.time())
+            for target in data.get('targets', []):
+                for parameter in target.get('parameters', []):
+                    app_run_id = self.new_id('app_run')
+                    self.table('app_run')[app_run_id] = {
+                        'id': app_run_id,
+                        'action_run_id': record['id'],
+                        'app_id': target.get('app_id'),
+                        'status': 'running',
+                        'message': '1 action succeeded',
+                        'result_summary': {'total_objects': 1, 'total_objects_successful': 1},
+                        'result_data': [{'parameter': parameter, 'data': [{'detail': 'x' * 256}], 'status': 'success'}]
+                    }
+            self.table(record_type)[record['id']] = record
+            return {'success': True, 'action_run_id': record['id']}
+        if record_type == 'playbook_run':
+            record.update(status='running', _launched=time.time())
+            self.table(record_type)[record['id']] = record
+            return {'playbook_run_id': record['id']}
+
+        self.table(record_type)[record['id']] = record
+        return {'success': True, 'id': record['id']}
+
+def _filter_value(value):
+    value = unquote(value).strip('"')
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def _matches(record, field, filter_type, value):
+    record_value = record.get(field)
+    if filter_type == 'in':
+        return record_value in [_filter_value(item) for item in value.split(',')]
+
+    value = _filter_value(value)
+    if filter_type == 'exact':
+        return record_value == value
+    if filter_type == 'iexact':
+        return str(record_value).lower() == str(value).lower()
+    if filter_type == 'contains':
+        return str(value) in str(record_value)
+    if filter_type == 'icontains':
+        return str(value).lower() in str(record_value).lower()
+    if record_value is None:
+        return False
+    if filter_type == 'gt':
+        return record_value > value
+    if filter_type == 'gte':
+        return record_value >= value
+    if filter_type == 'lt':
+        return record_value < value
+    if filter_type == 'lte':
+        return record_value <= value
+
+    return True
+
+def _public(record):
+    return dict((key, value) for key, value in record.items() if not key.startswith('_'))
+
+class mock_phantom_handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send each response in one write, without nagle delays, so the mock doesn't add latency of its own
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _route(self):
+        time.sleep(self.state.latency)
+        with self.state.lock:
+            self.state.request_count += 1
+
+        url = urlparse(self.path)
+        match = _PATH_RE.match(unquote(url.path))
+        if not match:
+            self._respond(404, {'failed': True, 'message': 'item not found'})
+            return None
+
+        return match, parse_qsl(url.query, keep_blank_values=True)
+
+    def do_GET(self):
+        routed = self._route()
+        if routed is None:
+            return
+        match, query = routed
+        record_type, record_id, detail = match.group('record_type', 'record_id', 'detail')
+
+        with self.state.lock:
+            table = self.state.table(record_type)
+
+            if record_type == 'decided_list' and record_id:
+                for record in table.values():
+                    if record['name'] == record_id or str(record['id']) == record_id:
+                        return self._respond(200, _public(record))
+                return self._respond(404, {'failed': True, 'message': 'item not found'})
+
+            if record_id and not detail:
+                record = table.get(_filter_value(record_id))
+                if record is None:
+                    return self._respond(404, {'failed': True, 'message': 'item not found'})
+                if record_type in _RUN_TYPES:
+                    self.state.refresh_run(record_type, record)
+                return self._respond(200, _public(record))
+
+            if detail == 'artifacts':
+                rows = [row for row in self.state.table('artifact').values() if row.get('container_id') == _filter_value(record_id)]
+            else:
+                rows = list(table.values())
+
+            params = dict(query)
+            for key, value in query:
+                if key.startswith('_filter_'):
+                    field, _, filter_type = key[len('_filter_'):].rpartition('__')
+                    rows = [row for row in rows if _matches(row, field, filter_type, value)]
+
+            if record_type in _RUN_TYPES:
+                for row in rows:
+                    self.state.refresh_run(record_type, row)
+
+            sort_field = params.get('sort', 'id')
+            rows.sort(key=lambda row: (row.get(sort_field) is None, row.get(sort_field)), reverse=params.get('order', 'desc') == 'desc')
+
+            page_size = int(params.get('page_size', 10))
+            page = int(params.get('page') or 0)
+            count = len(rows)
+            if page_size:
+                skipped = page * page_size
+                rows = rows[skipped:skipped + page_size]
+                num_pages = (count + page_size - 1) // page_size
+            else:
+                skipped = 0
+                num_pages = 1
+            rows = [_public(row) for row in rows]
+
+        if self.state.offset_latency and skipped:
+            time.sleep(self.state.offset_latency * skipped / 1000.0)
+
+        self._respond(200, {'count': count, 'num_pages': num_pages, 'data': rows})
+
+    def do_POST(self):
+        routed = self._route()
+        if routed is None:
+            return
+        match, _ = routed
+        record_type, record_id = match.group('record_type', 'record_id')
+        body = self._read_body()
+
+        with self.state.lock:
+            table = self.state.table(record_type)
+
+            if record_type == 'decided_list' and record_id:
+                for record in table.values():
+                    if record['name'] == record_id:
+                        if 'content' in body:
+                            record['content'] = body['content']
+                        record['content'].extend(body.get('append_rows', []))
+                        for row_num, row in body.get('update_rows', {}).items():
+                            record['content'][int(row_num)] = row
+                        for row_num in sorted(body.get('delete_rows', []), reverse=True):
+                            del record['content'][row_num]
+                        return self._respond(200, {'success': True})
+                return self._respond(404, {'failed': True, 'message': 'item not found'})
+
+            if record_id:
+                record = table.get(_filter_value(record_id))
+                if record is None:
+                    return self._respond(404, {'failed': True, 'message': 'item not found'})
+                if body.get('cancel') and record_type in _RUN_TYPES:
+                    record['status'] = 'cancelled'
+                else:
+                    record.update(body)
+                return self._respond(200, {'success': True, 'id': record['id']})
+
+            if isinstance(body, list):
+                return self._respond(200, [self.state.create(record_type, item) for item in body])
+
+            result = self.state.create(record_type, body)
+
+        self._respond(200 if not result.get('failed') else 400, result)
+
+    def do_DELETE(self):
+        routed = self._route()
+        if routed is None:
+            return
+        match, _ = routed
+        record_type, record_id = match.group('record_type', 'record_id')
+
+        with self.state.lock:
+            record = self.state.table(record_type).pop(_filter_value(record_id), None)
+
+        if record is None:
+            return self._respond(404, {'failed': True, 'message': 'item not found'})
+        self._respond(200, {'success': True})
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, offset_latency=0.0, run_duration=0.0):
+    """Starts the mock server on a background thread.
+
+    Keyword Args:
+        host (string): interface to listen on.
+        port (int): port to listen on - 0 picks a free port.
+        latency (float): seconds every request sleeps before responding.
+        offset_latency (float): extra seconds per 1000 records skipped by ``page``.
+        run_duration (float): seconds after launch at which action and playbook runs complete.
+
+    Returns:
+        tuple: ``(server, state, base_url)`` - call ``server.shutdown()`` to stop it.
+    """
+
+    state = mock_phantom_state(latency=latency, offset_latency=offset_latency, run_duration=run_duration)
+    handler = type('bound_mock_phantom_handler', (mock_phantom_handler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server, state, 'http://' + host + ':' + str(server.server_address[1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-memory phantom REST API stand-in.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--offset-latency', type=float, default=0.0)
+    parser.add_argument('--run-duration', type=float, default=0.0)
+    parser.add_argument('--preload-containers', type=int, default=0)
+    parser.add_argument('--preload-artifacts', type=int, default=0, help='artifacts per preloaded container')
+    args = parser.parse_args()
+
+    server, state, base_url = start_server(args.host, args.port, args.latency, args.offset_latency, args.run_duration)
+    state.add_containers(args.preload_containers, artifacts_per_container=args.preload_artifacts)
+    print('mock phantom listening on ' + base_url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,290 @@
+"""Throughput benchmarks for the phantom_api package, run against the local mock phantom server.
+
+Starts ``mock_phantom.py`` in a child process (so only the client is measured), runs each scenario
+and reports requests/sec, p50/p99 request latency and peak python memory (tracemalloc) of the client.
+
+Scenarios:
+    ingest          - save containers with ``ph_container.save()`` and their artifacts with ``ph_artifact.save()``
+    ingest_bulk     - the same, saving each container's artifacts with ``ph_artifact.save_many()``
+    ingest_embedded - the same, with the artifacts created in the container request
+    ingest_pipeline - the same, through ``ph_ingest_pipeline``
+    query_iter      - walk every preloaded container with ``ph_base.iter_query()``
+    query_parallel  - the same walk with parallel read-ahead (``workers``)
+    query_scan      - the same records with ``ph_base.scan()`` (keyset shards)
+    query_all       - a single ``ph_base.query()`` with ``page_size=0``
+    action_fanout   - launch actions with ``ph_action.run()``, then poll ``ph_action.get_action_status()``
+    list_update     - append rows to a custom list with ``ph_list.update_list()``
+
+Example:
+    Compare two branches with 5ms of simulated server latency::
+
+        python benchmarks/run_benchmarks.py --latency 0.005 --json > before.json
+        git checkout my-branch
+        python benchmarks/run_benchmarks.py --latency 0.005 --json > after.json
+"""
+
+import argparse
+import collections
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from phantom_api import ph_base
+from phantom_api.ph_actions import ph_action
+from phantom_api.ph_events import ph_artifact, ph_container
+from phantom_api.ph_ingest import ph_ingest_pipeline
+from phantom_api.ph_lists import ph_list
+
+def bench_ingest(args):
+    def ingest(container_num):
+        container = ph_container(
+            'benchmark',
+            'benchmark container ' + str(container_num),
+            source_data_identifier='bench-' + str(container_num) + '-' + args.run_id
+        )
+        container.save()
+        for artifact_num in range(args.artifacts):
+            ph_artifact(
+                {'sourceAddress': '10.0.0.' + str(artifact_num % 255)},
+                container.id,
+                'benchmark',
+                source_data_identifier='artifact-' + str(artifact_num)
+            ).save()
+
+    _run_parallel(ingest, range(args.containers), args.workers)
+
+def bench_ingest_bulk(args):
+    def ingest(container_num):
+        container = ph_container(
+            'benchmark',
+            'benchmark container ' + str(container_num),
+            source_data_identifier='bench-bulk-' + str(container_num) + '-' + args.run_id
+        )
+        container.save()
+        ph_artifact.save_many([
+            ph_artifact(
+                {'sourceAddress': '10.0.0.' + str(artifact_num % 255)},
+                container.id,
+                'benchmark',
+                source_data_identifier='artifact-' + str(artifact_num)
+            )
+            for artifact_num in range(args.artifacts)
+        ])
+
+    _run_parallel(ingest, range(args.containers), args.workers)
+
+def bench_ingest_embedded(args):
+    _run_parallel(lambda container: container.save(), _embedded_containers(args, 'bench-embedded-'), args.workers)
+
+def bench_ingest_pipeline(args):
+    ph_ingest_pipeline(workers=args.workers).run(_embedded_containers(args, 'bench-pipeline-'))
+
+def _embedded_containers(args, prefix):
+    for container_num in range(args.containers):
+        yield ph_container(
+            'benchmark',
+            'benchmark container ' + str(container_num),
+            source_data_identifier=prefix + str(container_num) + '-' + args.run_id,
+            artifacts=[
+                ph_artifact(
+                    {'sourceAddress': '10.0.0.' + str(artifact_num % 255)},
+                    None,
+                    'benchmark',
+                    source_data_identifier='artifact-' + str(artifact_num)
+                )
+                for artifact_num in range(args.artifacts)
+            ]
+        )
+
+def bench_query_iter(args):
+    for _ in ph_base.iter_query('container', filters=_preloaded_filter(), page_size=args.page_size):
+        pass
+
+def bench_query_parallel(args):
+    for _ in ph_base.iter_query('container', filters=_preloaded_filter(), page_size=args.page_size, workers=args.workers):
+        pass
+
+def bench_query_scan(args):
+    for _ in ph_base.scan('container', filters=_preloaded_filter(), page_size=args.page_size, shards=args.workers):
+        pass
+
+def bench_query_all(args):
+    ph_base.query('container', filters=_preloaded_filter(), page_size=0)
+
+def bench_action_fanout(args):
+    actions = [
+        ph_action(
+            'ip reputation',
+            container_num + 1,
+            'benchmark action ' + str(container_num),
+            targets=[{'assets': ['virustotal'], 'parameters': [{'ip': '8.8.8.8'}], 'app_id': 1}]
+        )
+        for container_num in range(args.actions)
+    ]
+
+    _run_parallel(lambda action: action.run(), actions, args.workers)
+    _run_parallel(lambda action: action.status(), actions, args.workers)
+
+def bench_list_update(args):
+    bench_list = ph_list('benchmark list ' + args.run_id, content=[['value', 'count']])
+    bench_list.save()
+    for row_num in range(args.list_updates):
+        bench_list.update_list(append_data=[['value ' + str(row_num), str(row_num)]])
+
+SCENARIOS = collections.OrderedDict([
+    ('ingest', bench_ingest),
+    ('ingest_bulk', bench_ingest_bulk),
+    ('ingest_embedded', bench_ingest_embedded),
+    ('ingest_pipeline', bench_ingest_pipeline),
+    ('query_iter', bench_query_iter),
+    ('query_parallel', bench_query_parallel),
+    ('query_scan', bench_query_scan),
+    ('query_all', bench_query_all),
+    ('action_fanout', bench_action_fanout),
+    ('list_update', bench_list_update)
+])
+
+def _preloaded_filter():
+    return [{'field': 'label', 'type': 'exact', 'value': 'events'}]
+
+def _run_parallel(func, items, workers):
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for future in [executor.submit(func, item) for item in items]:
+            future.result()
+    finally:
+        executor.shutdown()
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_scenario(name, args):
+    """Runs one scenario and returns its measurements."""
+
+    latencies = []
+    lock = threading.Lock()
+
+    def record_latency(request_info):
+        with lock:
+            latencies.append(request_info['latency'])
+
+    ph_base.add_request_hook(post=record_latency)
+    if args.memory:
+        tracemalloc.start()
+    start = time.time()
+    try:
+        SCENARIOS[name](args)
+    finally:
+        elapsed = time.time() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if args.memory else None
+        if args.memory:
+            tracemalloc.stop()
+        ph_base.remove_request_hook(post=record_latency)
+
+    latencies.sort()
+
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'peak_memory_kb': peak_memory / 1024.0 if peak_memory is not None else None
+    }
+
+def _start_mock_server(args):
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    listener.close()
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_phantom.py'),
+            '--port', str(port),
+            '--latency', str(args.latency),
+            '--offset-latency', str(args.offset_latency),
+            '--preload-containers', str(args.records)
+        ],
+        stdout=subprocess.DEVNULL
+    )
+
+    deadline = time.time() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except (IOError, OSError):
+            if time.time() > deadline or server.poll() is not None:
+                server.kill()
+                raise Exception('Mock phantom server did not start.')
+            time.sleep(0.1)
+
+    return server, 'http://127.0.0.1:' + str(port)
+
+def main():
+    parser = argparse.ArgumentParser(description='phantom_api throughput benchmarks.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated, from: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--base-url', help='run against this server instead of starting the mock server')
+    parser.add_argument('--auth-token', default='benchmark')
+    parser.add_argument('--latency', type=float, default=0.002, help='mock server latency per request (seconds)')
+    parser.add_argument('--offset-latency', type=float, default=0.0, help='mock server latency per 1000 records skipped by page offsets')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--containers', type=int, default=200, help='containers saved by ingest')
+    parser.add_argument('--artifacts', type=int, default=10, help='artifacts per ingested container')
+    parser.add_argument('--records', type=int, default=20000, help='containers preloaded for the query scenarios')
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--actions', type=int, default=200)
+    parser.add_argument('--list-updates', type=int, default=200)
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc (it slows the client down)')
+    parser.add_argument('--json', action='store_true', help='print results as json')
+    args = parser.parse_args()
+    args.run_id = str(int(time.time()))
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = _start_mock_server(args)
+
+    try:
+        ph_base.setup_connection(auth_token=args.auth_token, base_url=base_url, pool_size=args.pool_size)
+        results = [run_scenario(name.strip(), args) for name in args.scenarios.split(',') if name.strip()]
+    finally:
+        ph_base.close_connection()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return
+
+    row_format = '{:<16} {:>9} {:>9} {:>11} {:>9} {:>9} {:>12}'
+    print(row_format.format('scenario', 'requests', 'seconds', 'requests/s', 'p50 ms', 'p99 ms', 'peak mem kb'))
+    for result in results:
+        print(row_format.format(
+            result['scenario'],
+            result['requests'],
+            '%.2f' % result['seconds'],
+            '%.1f' % result['requests_per_second'],
+            '%.2f' % result['p50_ms'],
+            '%.2f' % result['p99_ms'],
+            '%.0f' % result['peak_memory_kb'] if result['peak_memory_kb'] is not None else '-'
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,27 @@
 import json
-import ph_base
-import ph_consts
+from phantom_api import ph_base
+from phantom_api import ph_consts
 from datetime import datetime
 import json
 
 #from ph_lists import ph_list
-from ph_assets import ph_asset
-from ph_cases import ph_case
-from ph_cases import ph_phase
-from ph_cases import ph_task
-from ph_events import ph_container
-from ph_events import ph_artifact
-from ph_users import ph_user
-from ph_users import ph_role
-from ph_actions import ph_action
-from ph_actions import ph_playbook
-from ph_apps import ph_app
+from phantom_api.ph_assets import ph_asset
+from phantom_api.ph_cases import ph_case
+from phantom_api.ph_cases import ph_phase
+from phantom_api.ph_cases import ph_task
+from phantom_api.ph_events import ph_container
+from phantom_api.ph_events import ph_artifact
+from phantom_api.ph_index import ph_sdi_index
+from phantom_api.ph_ingest import ph_ingest_pipeline
+from phantom_api.ph_journals import ph_journal
+from phantom_api.ph_scheduler import ph_run_scheduler
+from phantom_api.ph_scheduler import ph_run_handle
+from phantom_api.ph_updates import ph_update_buffer
+from phantom_api.ph_users import ph_user
+from phantom_api.ph_users import ph_role
+from phantom_api.ph_actions import ph_action
+from phantom_api.ph_actions import ph_playbook
+from phantom_api.ph_apps import ph_app
 #from ph_events import ph_container
 #from ph_cases import ph_case
 
@@ -1,7 +1,11 @@
 from datetime import datetime
-import json
+import time
 from phantom_api import ph_base
 from phantom_api import ph_consts
+from phantom_api import ph_scheduler
+
+# marks an app run whose result_data hasn't been downloaded - None is a valid result_data
+_NOT_LOADED = object()
 
 class ph_action(object):
     """Facilitates action execution in phantom
@@ -38,25 +42,99 @@ class ph_action(object):
         self.action_id = action_id
         self.action_type = action_type
 
-    def run(self):
+    def run(self, handle=False, scheduler=None):
         """Used to run a phantom action.
 
         After ``run()`` is called the action_id is set on the object.
+
+        Keyword Args:
+            handle (bool): return a ``ph_run_handle`` that resolves once the action finishes, instead
+                of the launch response. Defaults to False.
+            scheduler (ph_run_scheduler): scheduler tracking the action when ``handle`` is True.
+                Defaults to the shared ``ph_scheduler.default_scheduler()``.
         
         Raises:
             Exception: If action fails, exception is raised.
         
         Returns:
-            [int]: Returns the action run id of the phanton action.
+            [int]: Returns the action run id of the phanton action - or a ``ph_run_handle`` if ``handle`` is True.
+
+        Example:
+            Run actions concurrently and wait for them together::
+
+                handles = [action.run(handle=True) for action in actions]
+                results = [h.result(timeout=600) for h in handles]
         """
 
         response = ph_base._send_request(
             '/rest/action_run',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
+        response = self._process_run_response(response)
+        if not handle:
+            return response
+
+        scheduler = scheduler or ph_scheduler.default_scheduler()
+        return ph_scheduler.ph_run_handle(
+            'action_run',
+            self.action_id,
+            response,
+            scheduler.track_action(self.action_id, key=self.action),
+            ph_action.cancel_action
+        )
+
+    @classmethod
+    def run_many(cls, actions, max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY, rate=None):
+        """Runs many actions, with up to ``max_concurrency`` launch requests in flight.
+
+        Sets the ``action_id`` of every action that was launched. An action that fails to launch
+        doesn't stop the others.
+
+        Args:
+            actions (list): ``ph_action`` objects to run.
+
+        Keyword Args:
+            max_concurrency (int): maximum number of launch requests in flight at once. Defaults to 8.
+            rate (float): maximum number of actions launched per second. Defaults to None (no limit).
+
+        Returns:
+            list: one result per action, in order - the response returned by ``run()``, or
+            ``{'success': False, 'failed': True, 'message': details}`` if the action failed to launch.
+
+        Example:
+            Run ip reputation on the source address of many containers::
+
+                actions = [
+                    ph_action('ip reputation', container_id, 'vt ip reputation',
+                        targets=[{'assets': ['virustotal'], 'parameters': [{'ip': ip}], 'app_id': 35}])
+                    for container_id, ip in incidents
+                ]
+                results = ph_action.run_many(actions, max_concurrency=16, rate=50)
+                failed = [action for action, result in zip(actions, results) if result.get('failed')]
+        """
+
+        limiter = ph_base._rate_limiter(rate) if rate else None
+
+        def launch(action):
+            if limiter is not None:
+                limiter.wait()
+            try:
+                return action.run()
+            except Exception as err:
+                return {
+                    ph_consts.ACTION_SUCCESS_KEY: False,
+                    ph_consts.RESPONSE_FAILED_KEY: True,
+                    ph_consts.ACTION_FAILED_MESSAGE_KEY: str(err)
+                }
+
+        return ph_base._map_concurrently(launch, actions, max_concurrency=max_concurrency)
+
+    def _process_run_response(self, response):
+        """Sets the action id from an action_run POST response. See ``run()``."""
+
         if not(response.get(ph_consts.ACTION_SUCCESS_KEY)):
             raise Exception(response[ph_consts.ACTION_FAILED_MESSAGE_KEY])
 
@@ -105,12 +183,37 @@ class ph_action(object):
 
         return action_json
 
-    def action_results(self):
-        return ph_action.get_action_results(self.action_id)
+    def action_results(self, lazy=False, page_size=ph_consts.APP_RUN_PAGE_SIZE):
+        """Returns the results of the action - see ``ph_action.get_action_results()``."""
+
+        return ph_action.get_action_results(self.action_id, lazy=lazy, page_size=page_size)
 
     @classmethod
-    def get_action_results(cls, action_id):
-    
+    def get_action_results(cls, action_id, lazy=False, page_size=ph_consts.APP_RUN_PAGE_SIZE):
+        """Returns the app runs of an action, with their results.
+
+        Args:
+            action_id (int): id of the action.
+
+        Keyword Args:
+            lazy (bool): return a ``ph_action_results`` that pages through the app runs and fetches each
+                one's ``result_data`` only when it is used, instead of one response holding all of them.
+                Defaults to False.
+            page_size (int): app runs per request when ``lazy`` is True. Defaults to 100.
+
+        Returns:
+            dict: the ``app_run`` query response, every ``result_data`` included - or a ``ph_action_results``
+            if ``lazy`` is True.
+
+        Example:
+            Count the successful objects of a large action without downloading its results::
+
+                counts = ph_action.get_action_results(444, lazy=True).counts()
+                print(counts['total_objects_successful'], 'of', counts['total_objects'])
+        """
+
+        if lazy:
+            return ph_action_results(action_id, page_size=page_size)
 
         response = ph_base._send_request(
             '/rest/app_run?include_expensive=True&_filter_action_run_id=' + str(action_id),
@@ -163,6 +266,61 @@ class ph_action(object):
 
         return(response)
 
+    @classmethod
+    def wait_for_actions(cls, action_ids, timeout=None, poll_interval=ph_consts.ACTION_WAIT_POLL_INTERVAL):
+        """Waits for many actions to finish, yielding each one as soon as it does.
+
+        Every ``poll_interval`` seconds the statuses of all outstanding actions are read with a single
+        ``action_run`` query per 100 ids (rather than one request per action). Actions are dropped from
+        the poll once they reach a terminal status (success, failed or cancelled).
+
+        Args:
+            action_ids (list): ids of running actions.
+
+        Keyword Args:
+            timeout (float): seconds to wait for all actions. Defaults to None (wait forever).
+            poll_interval (float): seconds between polls. Defaults to 2.
+
+        Raises:
+            Exception: Raises exception if the actions haven't all finished within ``timeout`` (the ones
+                that did have been yielded), or if phantom returns an error.
+
+        Yields:
+            tuple: ``(action_id, action_run)`` - ``action_run`` is the record of the finished action, as
+            returned by ``get_action_status()``.
+
+        Example:
+            Launch actions and handle each one as it completes::
+
+                ph_action.run_many(actions)
+                for action_id, action_run in ph_action.wait_for_actions([action.action_id for action in actions], timeout=600):
+                    print(action_id, action_run['status'])
+        """
+
+        outstanding = set(action_id for action_id in action_ids if action_id is not None)
+        deadline = time.time() + timeout if timeout is not None else None
+
+        while outstanding:
+            for _, finished, error in ph_scheduler._finished_runs('action_run', sorted(outstanding)):
+                if error is not None:
+                    raise error
+
+                for action_id in sorted(finished):
+                    outstanding.discard(action_id)
+                    yield action_id, finished[action_id]
+
+            if not outstanding:
+                return
+
+            delay = poll_interval
+            if deadline is not None:
+                if time.time() >= deadline:
+                    raise Exception(
+                        'Timed out waiting for actions - ' + ', '.join(str(action_id) for action_id in sorted(outstanding))
+                    )
+                delay = min(delay, deadline - time.time())
+            time.sleep(max(0.0, delay))
+
     def cancel(self):
         """Cancels running action.
         
@@ -209,9 +367,10 @@ class ph_action(object):
                 ph_action.cancel_action(444) # cancels action
         """
         response = ph_base._send_request(
-            '/request/action_run/' + str(action_id),
+            '/rest/action_run/' + str(action_id),
             'post',
-            payload=json.dumps({'cancel': True})
+            payload=ph_base._dumps({'cancel': True}),
+            retry=True
         )
 
         if ph_consts.ACTION_CANCEL_FAILED_KEY in response:
@@ -266,25 +425,47 @@ class ph_playbook(object):
 
         return playbook_json
 
-    def run(self):
+    def run(self, handle=False, scheduler=None):
         """Runs the playbook
 
         After ``run()`` is called, the playbook_run_id attribute is set.
+
+        Keyword Args:
+            handle (bool): return a ``ph_run_handle`` that resolves once the playbook finishes, instead
+                of the launch response. Defaults to False.
+            scheduler (ph_run_scheduler): scheduler tracking the playbook when ``handle`` is True.
+                Defaults to the shared ``ph_scheduler.default_scheduler()``.
         
         Raises:
             Exception: Raises Exception if playbook fails to run.
         
         Returns:
-            [dict]: Returns the response dictionary from the playbook run.
+            [dict]: Returns the response dictionary from the playbook run - or a ``ph_run_handle`` if ``handle`` is True.
         """
 
         response = ph_base._send_request(
             '/rest/playbook_run',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
+        response = self._process_run_response(response)
+        if not handle:
+            return response
+
+        scheduler = scheduler or ph_scheduler.default_scheduler()
+        return ph_scheduler.ph_run_handle(
+            'playbook_run',
+            self.playbook_run_id,
+            response,
+            scheduler.track_playbook(self.playbook_run_id, key=self.playbook_id),
+            ph_playbook.cancel_playbook
+        )
+
+    def _process_run_response(self, response):
+        """Sets the playbook run id from a playbook_run POST response. See ``run()``."""
+
         if ph_consts.PLAYBOOK_RUN_ID not in response:
             raise Exception(response[ph_consts.PLAYBOOK_FAILED_MESSAGE_KEY])
 
@@ -381,12 +562,136 @@ class ph_playbook(object):
         """
 
         response = ph_base._send_request(
-            '/request/playbook_run/' + str(playbook_run_id),
+            '/rest/playbook_run/' + str(playbook_run_id),
             'post',
-            payload=json.dumps({'cancel': True})
+            payload=ph_base._dumps({'cancel': True}),
+            retry=True
         )
 
         if ph_consts.PLAYBOOK_CANCEL_FAILED_KEY in response:
             raise Exception(response[ph_consts.PLAYBOOK_FAILED_MESSAGE_KEY])
 
-        return True
\ No newline at end of file
+        return True
+
+class ph_action_results(object):
+    """Results of an action, read a page of app runs at a time.
+
+    App runs are listed without ``include_expensive``, so their ``result_data`` - the bulk of an
+    action's results - is only downloaded for the app runs whose ``result_data`` is used (see
+    ``ph_app_run_result``), or for every app run with ``app_runs(expensive=True)``.
+
+    Args:
+        action_id (int): id of the action.
+
+    Keyword Args:
+        page_size (int): app runs per request. Defaults to 100.
+
+    Example:
+        Print the results of the failed app runs only::
+
+            for app_run in ph_action.get_action_results(444, lazy=True):
+                if app_run['status'] == 'failed':
+                    print(app_run['message'], app_run.result_data)
+    """
+
+    def __init__(self, action_id, page_size=ph_consts.APP_RUN_PAGE_SIZE):
+        if action_id is None:
+            raise Exception('No action id was specified.')
+
+        self.action_id = action_id
+        self.page_size = page_size
+
+    def __iter__(self):
+        return self.app_runs()
+
+    def app_runs(self, expensive=False):
+        """Yields the app runs of the action as ``ph_app_run_result`` objects, in id order.
+
+        Keyword Args:
+            expensive (bool): download every app run's ``result_data`` with its page, rather than one
+                request per app run whose ``result_data`` is used. Defaults to False.
+        """
+
+        for page in self._pages(expensive):
+            for record in page:
+                yield ph_app_run_result(record)
+
+    def summaries(self, fields=ph_consts.APP_RUN_SUMMARY_FIELDS):
+        """Yields a dict of ``fields`` (status, message, result_summary... by default) per app run."""
+
+        for page in self._pages(False):
+            for record in page:
+                yield dict((field, record.get(field)) for field in fields)
+
+    def counts(self):
+        """Returns the number of app runs per status and the totals of their result summaries.
+
+        Returns:
+            dict: ``{'app_runs': n, 'statuses': {status: n}, 'total_objects': n, 'total_objects_successful': n}``
+        """
+
+        counts = {
+            'app_runs': 0,
+            'statuses': {},
+            'total_objects': 0,
+            'total_objects_successful': 0
+        }
+        for summary in self.summaries(fields=('status', ph_consts.APP_RUN_RESULT_SUMMARY_KEY)):
+            counts['app_runs'] += 1
+            counts['statuses'][summary['status']] = counts['statuses'].get(summary['status'], 0) + 1
+            result_summary = summary[ph_consts.APP_RUN_RESULT_SUMMARY_KEY] or {}
+            counts['total_objects'] += result_summary.get('total_objects', 0)
+            counts['total_objects_successful'] += result_summary.get('total_objects_successful', 0)
+
+        return counts
+
+    def _pages(self, expensive):
+        return ph_base._walk_keyset(
+            'app_run',
+            [{'field': 'action_run_id', 'type': 'exact', 'value': self.action_id}],
+            0,
+            page_size=self.page_size,
+            pretty=False,
+            include_expensive=expensive
+        )
+
+class ph_app_run_result(object):
+    """One app run of an action, from ``ph_action_results``.
+
+    Fields of the app run are read like a dict (``app_run['status']``, ``app_run.get('message')``).
+    ``result_data`` is downloaded the first time it is used, unless it came with the app run.
+
+    Args:
+        record (dict): the ``app_run`` record.
+    """
+
+    __slots__ = ('id', 'record', '_result_data')
+
+    def __init__(self, record):
+        self.id = record['id']
+        self._result_data = record.pop(ph_consts.APP_RUN_RESULT_DATA_KEY, _NOT_LOADED)
+        self.record = record
+
+    def __getitem__(self, field):
+        if field == ph_consts.APP_RUN_RESULT_DATA_KEY:
+            return self.result_data
+
+        return self.record[field]
+
+    def get(self, field, default=None):
+        if field == ph_consts.APP_RUN_RESULT_DATA_KEY:
+            return self.result_data
+
+        return self.record.get(field, default)
+
+    @property
+    def result_data(self):
+        """The app run's results (list) - downloaded on first use."""
+
+        if self._result_data is _NOT_LOADED:
+            response = ph_base.query('app_run', query_id=self.id, pretty=False, include_expensive=True, use_cache=False)
+            if type(response) is not dict or ph_consts.APP_RUN_RESULT_DATA_KEY not in response:
+                raise Exception('Error retrieving results of app run ' + str(self.id) + '. Details: ' + str(response))
+            self._result_data = response[ph_consts.APP_RUN_RESULT_DATA_KEY]
+
+        return self._result_data
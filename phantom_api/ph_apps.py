@@ -1,5 +1,4 @@
 from datetime import datetime
-import json
 from phantom_api import ph_base
 from phantom_api import ph_consts
 import base64
@@ -45,7 +44,7 @@ class ph_app(object):
         response = ph_base._send_request(
             '/rest/app',
             'post',
-            payload=json.dumps(payload),
+            payload=ph_base._dumps(payload),
             content_type='application/json'
         )
 
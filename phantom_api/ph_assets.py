@@ -1,5 +1,4 @@
 from datetime import datetime
-import json
 from phantom_api import ph_base
 from phantom_api import ph_consts
 
@@ -116,7 +115,7 @@ class ph_asset(object):
         response = ph_base._send_request(
             '/rest/asset',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
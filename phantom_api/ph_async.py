@@ -0,0 +1,440 @@
+"""Asyncio versions of the calls that block on the phantom REST API.
+
+Connection settings (base url, credentials, certificate verification) are shared with ``ph_base`` -
+call ``ph_base.setup_connection()`` first. Every coroutine in this module goes through one shared
+aiohttp connection pool and a semaphore that limits how many requests are in flight at once, so
+thousands of calls can be awaited together from a single event loop.
+
+Requires aiohttp (python 3.5+). This module is not imported by the package ``__init__``.
+
+Example:
+    Save a container and its artifacts, then run an action, without blocking the event loop::
+
+        ph_base.setup_connection(auth_token=token, base_url='https://phantom-hostname')
+        ph_async.setup(max_concurrency=200)
+
+        async def ingest(container, artifacts, action):
+            await ph_async.save_container(container)
+            for artifact in artifacts:
+                artifact.container_id = container.id
+            await asyncio.gather(*[ph_async.save_artifact(artifact) for artifact in artifacts])
+            action.container_id = container.id
+            await ph_async.run_action(action)
+
+        asyncio.get_event_loop().run_until_complete(ingest(container, artifacts, action))
+        asyncio.get_event_loop().run_until_complete(ph_async.close())
+"""
+
+import asyncio
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+from phantom_api import ph_base
+from phantom_api import ph_consts
+from phantom_api.ph_events import ph_artifact
+
+_async_connect = {
+    'max_concurrency': ph_consts.ASYNC_DEFAULT_MAX_CONCURRENCY,
+    'pool_size': ph_consts.ASYNC_DEFAULT_POOL_SIZE,
+    'session': None,
+    'semaphore': None,
+    'loop': None,
+    # connection settings the session was created with
+    'settings': None
+}
+
+def setup(
+    max_concurrency=ph_consts.ASYNC_DEFAULT_MAX_CONCURRENCY,
+    pool_size=ph_consts.ASYNC_DEFAULT_POOL_SIZE
+):
+    """Configures the shared async connection pool.
+
+    Keyword Args:
+        max_concurrency (int): maximum number of requests in flight at once. Defaults to 100.
+        pool_size (int): maximum number of open connections to phantom. Defaults to 100.
+
+    Note:
+        Takes effect the next time a pool is created - call ``close()`` first if one is already open.
+    """
+
+    _async_connect['max_concurrency'] = max_concurrency
+    _async_connect['pool_size'] = pool_size
+
+async def close():
+    """Closes the shared async connection pool. A new one is created on the next request."""
+
+    session = _async_connect['session']
+    _async_connect['session'] = None
+    _async_connect['semaphore'] = None
+    _async_connect['loop'] = None
+    _async_connect['settings'] = None
+
+    if session is not None and not session.closed:
+        await session.close()
+
+def _get_session():
+    """Returns the shared aiohttp session and semaphore for the running event loop, creating them if needed."""
+
+    if aiohttp is None:
+        raise Exception('aiohttp must be installed to use ph_async.')
+    if not ph_base.ready():
+        raise Exception('Connection is not set up. Call ph_base.setup_connection() first.')
+
+    loop = asyncio.get_event_loop()
+    settings = (dict(ph_base._ph_connect['header'] or {}), ph_base._ph_connect['verify_cert'])
+    if _async_connect['session'] is not None and _async_connect['settings'] != settings and not _async_connect['session'].closed:
+        # ph_base.setup_connection() changed the credentials or certificate checks - start a new pool
+        if _async_connect['loop'] is loop:
+            asyncio.ensure_future(_async_connect['session'].close())
+        _async_connect['session'] = None
+
+    if _async_connect['session'] is None or _async_connect['loop'] is not loop or _async_connect['session'].closed:
+        connector = aiohttp.TCPConnector(
+            limit=_async_connect['pool_size'],
+            ssl=None if ph_base._ph_connect['verify_cert'] else False
+        )
+        _async_connect['session'] = aiohttp.ClientSession(
+            connector=connector,
+            headers=ph_base._ph_connect['header'],
+            # stateless like the sync session - see ph_base._get_session()
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+        _async_connect['semaphore'] = asyncio.Semaphore(_async_connect['max_concurrency'])
+        _async_connect['loop'] = loop
+        _async_connect['settings'] = settings
+
+    return _async_connect['session'], _async_connect['semaphore']
+
+async def _send_request(url, method, payload=None, content_type=None, retry=None):
+    """Awaitable version of ``ph_base._send_request``, including its retries and request hooks.
+
+    Args:
+        method (string): http methods to use e.g. POST, GET, PUT...
+        payload (string): data to be posted to REST API endpoint.
+        content_type (string): content type of request e.g. application/json.
+        retry (bool): see ``ph_base._send_request``.
+
+    Returns:
+        dict: returns a dictionary representing the request data that was returned.
+    """
+
+    request_info = None
+    if ph_base._request_hooks['pre'] or ph_base._request_hooks['post']:
+        request_info = ph_base._start_request_hooks(url, method, payload)
+
+    response_cache = ph_base._ph_connect['cache']
+    try:
+        status, reason, body = await _request_with_retries(url, method, payload, retry, request_info)
+    except Exception as err:
+        if request_info is not None:
+            ph_base._finish_request_hooks(request_info, None, None, err)
+        raise
+    finally:
+        # writes make cached copies of the record (and lists of its type) stale - see ph_base._send_request
+        if response_cache is not None and method.lower() != 'get':
+            response_cache.invalidate_url(url)
+
+    if request_info is not None:
+        ph_base._finish_request_hooks(request_info, status, len(body), None)
+
+    try:
+        results = ph_base._loads(body)
+    except ValueError:
+        results = body.decode('utf-8', 'replace')
+
+    return ph_base._check_status(ph_base._ph_connect['base_url'] + url, status, reason, results)
+
+async def _request_with_retries(url, method, payload, retry, request_info=None):
+    """Sends the request, retrying like ``ph_base._request_with_retries``.
+
+    Returns:
+        tuple: ``(status, reason, body)`` of the final response.
+    """
+
+    url = ph_base._ph_connect['base_url'] + url
+
+    if method.lower() not in ph_consts.HTTP_METHODS:
+        raise ValueError('Incorrect requests action specified')
+
+    auth = None
+    if 'audit' in url or 'ph_user' in url or ph_base._ph_connect['header'] is None:
+        auth = aiohttp.BasicAuth(ph_base._ph_connect['username'], ph_base._ph_connect['password'])
+
+    session, semaphore = _get_session()
+
+    retries_left = ph_base._ph_connect['max_retries'] if ph_base._should_retry(method, retry) else 0
+    attempt = 0
+    while True:
+        try:
+            async with semaphore:
+                async with session.request(method.upper(), url, data=payload, auth=auth) as r:
+                    status, reason = r.status, r.reason
+                    retry_after = r.headers.get('Retry-After')
+                    body = await r.read()
+        except aiohttp.ClientSSLError as err:
+            raise Exception(
+                'Error connecting to API - '
+                'Likely due to the "validate server certificate" option. '
+                'Details: ' + str(err)
+            )
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+            if attempt >= retries_left:
+                raise Exception(
+                    'Error calling - ' + url + ' - Details: ' + str(err)
+                )
+            await asyncio.sleep(ph_base._retry_delay(attempt))
+            attempt += 1
+            if request_info is not None:
+                request_info['retries'] = attempt
+            continue
+        except aiohttp.ClientError as err:
+            raise Exception(
+                'Error calling - ' + url + ' - Details: ' + str(err)
+            )
+
+        if status in ph_consts.RETRY_STATUS_CODES and attempt < retries_left:
+            await asyncio.sleep(ph_base._retry_delay(attempt, retry_after))
+            attempt += 1
+            if request_info is not None:
+                request_info['retries'] = attempt
+            continue
+
+        return status, reason, body
+
+async def query(
+    query_type,
+    order='desc',
+    filters=[],
+    sort=None,
+    query_id=None,
+    detail=None,
+    pseudo_field=None,
+    page=None,
+    page_size=0,
+    pretty=True,
+    include_expensive=False
+):
+    """Awaitable version of ``ph_base.query``. Takes the same arguments."""
+
+    response = await _send_request(
+        ph_base._build_query_url(
+            query_type,
+            order=order,
+            filters=filters,
+            sort=sort,
+            query_id=query_id,
+            detail=detail,
+            pseudo_field=pseudo_field,
+            page=page,
+            page_size=page_size,
+            pretty=pretty,
+            include_expensive=include_expensive
+        ),
+        'GET'
+    )
+
+    return response
+
+async def _update_record(record_type, id, data):
+    """Awaitable version of ``ph_base._update_record``."""
+
+    response = await _send_request(
+        '/rest/' + record_type + '/' + str(id),
+        'post',
+        payload=ph_base._dumps(data),
+        content_type='application/json',
+        retry=True
+    )
+
+    return response
+
+async def _delete_record(record_type, id):
+    """Awaitable version of ``ph_base._delete_record``."""
+
+    response = await _send_request(
+        '/rest/' + record_type + '/' + str(id),
+        'delete'
+    )
+
+    return response
+
+#events
+async def save_container(
+    container,
+    artifact_embed_limit=ph_consts.CONTAINER_EMBEDDED_ARTIFACT_LIMIT,
+    artifact_batch_size=ph_consts.ARTIFACT_BATCH_SIZE
+):
+    """Awaitable version of ``ph_container.save()``, without ``index``.
+
+    Up to ``artifact_embed_limit`` ``ph_artifact`` objects are created with the container; the rest are
+    saved after it with ``save_artifacts()``. Every ``ph_artifact`` object gets its ``id`` and ``container_id``.
+
+    Args:
+        container (ph_container): container to save. Its ``id`` is set once saved.
+
+    Keyword Args:
+        artifact_embed_limit (int): maximum number of ``ph_artifact`` objects sent in the container
+            request. Defaults to 500.
+        artifact_batch_size (int): batch size for artifacts saved after the container. Defaults to 100.
+
+    Returns:
+        dict: ``{'id': id_number, 'created': True_or_False}``, with an ``artifacts`` list of per artifact
+        results if ``artifacts`` holds ``ph_artifact`` objects - see ``ph_container.save()``.
+    """
+
+    embedded_artifacts, remaining_artifacts = container._split_artifacts(artifact_embed_limit)
+
+    response = await _send_request(
+        '/rest/container',
+        'post',
+        payload=ph_base._dumps(container.render_dictionary(artifacts=embedded_artifacts)),
+        content_type='application/json',
+        retry=bool(container.source_data_identifier)
+    )
+
+    container_results = container._process_save_response(response)
+
+    if any(isinstance(artifact, ph_artifact) for artifact in container.artifacts):
+        embedded_ids = None
+        if container_results['created']:
+            embedded_ids = container._response_artifact_ids(response, embedded_artifacts)
+            if embedded_ids is None:
+                artifacts_page = await query(**container._embedded_artifacts_query(embedded_artifacts))
+                embedded_ids = container._page_artifact_ids(artifacts_page, embedded_artifacts)
+
+        results, unsaved_artifacts = container._set_embedded_artifact_ids(
+            embedded_artifacts,
+            remaining_artifacts,
+            embedded_ids
+        )
+        unsaved_results = await save_artifacts(unsaved_artifacts, artifact_batch_size)
+        for artifact, artifact_result in zip(unsaved_artifacts, unsaved_results):
+            results[id(artifact)] = artifact_result
+        container_results['artifacts'] = container._ordered_artifact_results(results)
+
+    return container_results
+
+async def save_artifact(artifact):
+    """Awaitable version of ``ph_artifact.save()``.
+
+    Args:
+        artifact (ph_artifact): artifact to save. Its ``id`` is set once saved.
+
+    Returns:
+        dict: ``{'id': id_number, 'created': True_or_False}``
+    """
+
+    response = await _send_request(
+        '/rest/artifact',
+        'post',
+        payload=ph_base._dumps(artifact.render_dictionary()),
+        content_type='application/json'
+    )
+
+    return artifact._process_save_response(response)
+
+async def save_artifacts(artifacts, batch_size=ph_consts.ARTIFACT_BATCH_SIZE):
+    """Awaitable version of ``ph_artifact.save_many()``, without ``index`` or ``journal``. The batches
+    are sent concurrently.
+
+    Args:
+        artifacts (list): list of ``ph_artifact`` objects. Their ``id`` is set once saved.
+
+    Keyword Args:
+        batch_size (int): number of artifacts sent per request. Defaults to 100.
+
+    Returns:
+        list: one dict per artifact, in input order - see ``ph_artifact.save_many()``.
+    """
+
+    artifacts = list(artifacts)
+    results = [None] * len(artifacts)
+
+    async def save_batch(batch_positions):
+        batch = [artifacts[position] for position in batch_positions]
+        try:
+            response = await _send_request(
+                '/rest/artifact',
+                'post',
+                payload=ph_base._dumps([artifact.render_dictionary() for artifact in batch]),
+                content_type='application/json'
+            )
+        except Exception as err:
+            response = err
+
+        ph_artifact._process_batch_response(batch_positions, batch, response, results)
+
+    await asyncio.gather(*[
+        save_batch(list(range(batch_start, min(batch_start + batch_size, len(artifacts)))))
+        for batch_start in range(0, len(artifacts), batch_size)
+    ])
+
+    return results
+
+#actions
+async def run_action(action):
+    """Awaitable version of ``ph_action.run()``.
+
+    Args:
+        action (ph_action): action to run. Its ``action_id`` is set once launched.
+
+    Returns:
+        dict: response from phantom.
+    """
+
+    response = await _send_request(
+        '/rest/action_run',
+        'post',
+        payload=ph_base._dumps(action.render_dictionary()),
+        content_type='application/json'
+    )
+
+    return action._process_run_response(response)
+
+async def get_action_status(action_id):
+    """Awaitable version of ``ph_action.get_action_status()``.
+
+    Args:
+        action_id (int): id of running action.
+    """
+
+    response = await _send_request(
+        '/rest/action_run/' + str(action_id),
+        'get'
+    )
+
+    return response
+
+async def run_playbook(playbook):
+    """Awaitable version of ``ph_playbook.run()``.
+
+    Args:
+        playbook (ph_playbook): playbook to run. Its ``playbook_run_id`` is set once launched.
+
+    Returns:
+        dict: response from phantom.
+    """
+
+    response = await _send_request(
+        '/rest/playbook_run',
+        'post',
+        payload=ph_base._dumps(playbook.render_dictionary()),
+        content_type='application/json'
+    )
+
+    return playbook._process_run_response(response)
+
+async def get_playbook_status(playbook_run_id):
+    """Awaitable version of ``ph_playbook.get_playbook_status()``.
+
+    Args:
+        playbook_run_id (int): Playbook run id from a running playbook.
+    """
+
+    response = await _send_request(
+        '/rest/playbook_run/' + str(playbook_run_id),
+        'get'
+    )
+
+    return response
@@ -3,33 +3,164 @@ http requests/posts/etc/ are made. Additionally standardizes other functionality
 the phantom_api package.
 """
 
+import bisect
+import codecs
+import collections
+import email.utils
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from cookielib import DefaultCookiePolicy
 import requests
+from requests.adapters import HTTPAdapter
 import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from phantom_api import ph_consts
 
+### JSON serialization
+_json_backend = {
+    'name': None,
+    'dumps': None,
+    'loads': None
+}
+
+def set_json_backend(name=None):
+    """Selects the library used to encode request bodies and decode responses.
+
+    Keyword Args:
+        name (string): ``orjson`` or ``json`` (the standard library). Defaults to None - orjson if it
+            is installed, json otherwise.
+
+    Raises:
+        Exception: Raises exception if the backend is unknown or not installed.
+
+    Returns:
+        string: name of the backend in use.
+
+    Note:
+        orjson is considerably faster on large payloads. Its output is compact (no spaces after
+        separators), which phantom accepts the same way.
+    """
+
+    if name is None:
+        name = ph_consts.JSON_BACKEND_ORJSON if orjson is not None else ph_consts.JSON_BACKEND_STDLIB
+
+    if name == ph_consts.JSON_BACKEND_ORJSON:
+        if orjson is None:
+            raise Exception('JSON backend - orjson - is not installed.')
+        _json_backend['dumps'] = _orjson_dumps
+        _json_backend['loads'] = orjson.loads
+    elif name == ph_consts.JSON_BACKEND_STDLIB:
+        _json_backend['dumps'] = _stdlib_dumps
+        _json_backend['loads'] = _stdlib_loads
+    else:
+        raise Exception(
+            'Invalid JSON backend - ' + str(name) + '. Select from one of the following: '
+            + ', '.join(ph_consts.JSON_BACKENDS) + '.'
+        )
+
+    _json_backend['name'] = name
+
+    return name
+
+def _dumps(data):
+    """Encodes ``data`` as a JSON request body (utf-8 bytes) with the selected backend."""
+
+    return _json_backend['dumps'](data)
+
+def _loads(body):
+    """Decodes a JSON response body (bytes or string) with the selected backend.
+
+    Raises:
+        ValueError: Raised if ``body`` is not valid JSON.
+    """
+
+    return _json_backend['loads'](body)
+
+def _orjson_dumps(data):
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+def _stdlib_dumps(data):
+    return json.dumps(data).encode('utf-8')
+
+def _stdlib_loads(body):
+    if type(body) is bytes:
+        body = body.decode('utf-8')
+
+    return json.loads(body)
+
+set_json_backend()
+
 ### Connection related objects/methods
 _ph_connect = {
     'base_url': None,
     'username': None,
     'password': None,
     'header': None,
-    'verify_cert': None
+    'verify_cert': None,
+    'pool_size': ph_consts.DEFAULT_POOL_SIZE,
+    'pool_block': True,
+    'session': None,
+    'request_slots': None,
+    'max_retries': ph_consts.DEFAULT_MAX_RETRIES,
+    'backoff_factor': ph_consts.DEFAULT_BACKOFF_FACTOR,
+    'backoff_max': ph_consts.DEFAULT_BACKOFF_MAX,
+    'retry_post': False,
+    'cache': None
 }
 
+_session_lock = threading.Lock()
+
 def setup_connection(
     auth_token=None,
     username=None,
     password=None,
     base_url='https://127.0.0.1',
-    verify_cert=False
+    verify_cert=False,
+    pool_size=ph_consts.DEFAULT_POOL_SIZE,
+    pool_block=True,
+    max_concurrency=None,
+    max_retries=ph_consts.DEFAULT_MAX_RETRIES,
+    backoff_factor=ph_consts.DEFAULT_BACKOFF_FACTOR,
+    backoff_max=ph_consts.DEFAULT_BACKOFF_MAX,
+    retry_post=False
 ):
     """Used to setup connection for http conections to phantom REST API.
 
+    All requests made by the package share a single pooled session. Connections to phantom are
+    kept alive and reused, so the TCP and TLS handshakes are only paid when a new connection is
+    added to the pool.
+
     Keyword Args:
         auth_token (string): Auth token for REST API connections to Phantom.
         username (string): GUI username
         password (string): GUI password
         base_url (string): Base url for phantom - e.g. https://192.168.116.129 or https://phantom-hostname
+        verify_cert (bool): Verify the phantom server certificate. Defaults to False.
+        pool_size (int): Maximum number of connections kept open to phantom. Defaults to 10.
+        pool_block (bool): If True, threads wait for a free connection once ``pool_size`` connections
+            are in use instead of opening extra, throw-away connections. Defaults to True.
+        max_concurrency (int): Maximum number of requests in flight to phantom at once, across every
+            thread and module. Defaults to None (no limit beyond the connection pool).
+        max_retries (int): Times a request is retried after a connection error or a 429/502/503/504
+            response. Defaults to 3. 0 disables retries.
+        backoff_factor (float): Base delay in seconds for the jittered exponential backoff between
+            retries. Defaults to 0.5.
+        backoff_max (float): Maximum backoff delay in seconds. A ``Retry-After`` header from phantom
+            takes precedence. Defaults to 30.
+        retry_post (bool): Retry POST requests as well as idempotent methods. Defaults to False - only
+            POSTs known to be safe to repeat (e.g. record updates) are retried.
 
     Note:
         ``auth_token`` OR ``username``/``password`` combo is needed, not both... unless you are querying audit data.
@@ -44,6 +175,60 @@ def setup_connection(
             'ph-auth-token': auth_token
         }
     _ph_connect['verify_cert'] = verify_cert
+    _ph_connect['pool_size'] = pool_size
+    _ph_connect['pool_block'] = pool_block
+    _ph_connect['request_slots'] = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+    _ph_connect['max_retries'] = max_retries
+    _ph_connect['backoff_factor'] = backoff_factor
+    _ph_connect['backoff_max'] = backoff_max
+    _ph_connect['retry_post'] = retry_post
+
+    # settings changed - drop any existing pool so the next request picks them up
+    close_connection()
+    if _ph_connect['cache'] is not None:
+        _ph_connect['cache'].clear()
+
+def close_connection():
+    """Closes all pooled connections to phantom.
+
+    Safe to call at any time - a new pool is created on the next request.
+    """
+
+    with _session_lock:
+        session = _ph_connect['session']
+        _ph_connect['session'] = None
+
+    if session is not None:
+        session.close()
+
+def _get_session():
+    """Returns the shared, pooled session - creating it if needed.
+
+    The session keeps no cookies, so requests stay as stateless as separate ``requests.get/post`` calls -
+    a cookie set in reply to a basic auth request is never sent with token authenticated ones.
+
+    Returns:
+        requests.Session: session shared by every thread and module in the package.
+    """
+
+    session = _ph_connect['session']
+    if session is None:
+        with _session_lock:
+            if _ph_connect['session'] is None:
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=_ph_connect['pool_size'],
+                    pool_block=_ph_connect['pool_block'],
+                    max_retries=0
+                )
+                new_session = requests.Session()
+                new_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                new_session.mount('https://', adapter)
+                new_session.mount('http://', adapter)
+                _ph_connect['session'] = new_session
+            session = _ph_connect['session']
+
+    return session
 
 def ready():
     """Checks to see if connection is ready (are parameters set)
@@ -59,62 +244,710 @@ def ready():
         )
     )
 
-def _send_request(url, method, payload=None, content_type=None):
+def _send_request(url, method, payload=None, content_type=None, retry=None, cache=False):
     """Sends https post/get/put... etc. to desired phantom API endpoint. There should
     be no need to call this directly.
 
+    Requests that fail with a connection error or one of ``ph_consts.RETRY_STATUS_CODES``
+    (429/502/503/504) are retried with jittered exponential backoff, honouring any ``Retry-After``
+    header. By default only idempotent methods are retried - see ``setup_connection()``.
+
     Args:
         method (string): http methods to use e.g. POST, GET, PUT...
         payload (string): data to be posted to REST API endpoint.
         content_type (string): content type of request e.g. application/json.
+        retry (bool): True to retry this request even if ``method`` is not idempotent, False to never
+            retry it. Defaults to None (decided by ``method``).
+        cache (bool): serve this GET from the response cache if it is enabled - see ``enable_cache()``.
+
+    Raises:
+        Exception: Raised if phantom can't be reached or returns an error status without a phantom
+            failure message in the body.
 
     Returns:
         dict: returns a dictionary representing the request data that was returned.
     """
+
+    response_cache = _ph_connect['cache']
+    use_cache = cache and response_cache is not None and method.lower() == 'get'
+    if use_cache:
+        cached_body = response_cache.get(url)
+        if cached_body is not None:
+            return _loads(cached_body)
+
+    try:
+        r = _perform_request(url, method, payload=payload, retry=retry)
+    finally:
+        # writes make cached copies of the record (and lists of its type) stale
+        if response_cache is not None and method.lower() != 'get':
+            response_cache.invalidate_url(url)
+
+    try:
+        results = _loads(r.content)
+    except ValueError:
+        results = r.text
+
+    results = _check_status(_ph_connect['base_url'] + url, r.status_code, r.reason, results)
+
+    if use_cache and r.status_code == 200 and type(results) in (dict, list):
+        response_cache.put(url, r.content)
+
+    return results
+
+def _perform_request(url, method, payload=None, retry=None, stream=False):
+    """Sends the request, retrying as described in ``_send_request()``, and runs any request hooks
+    registered with ``add_request_hook()``.
+
+    Keyword Args:
+        stream (bool): don't read the response body up front - see ``_stream_request()``.
+
+    Returns:
+        requests.Response: the final response.
+    """
+
+    if not _request_hooks['pre'] and not _request_hooks['post']:
+        return _request_with_retries(url, method, payload, retry, stream)
+
+    request_info = _start_request_hooks(url, method, payload)
+    r = None
+    error = None
+    try:
+        r = _request_with_retries(url, method, payload, retry, stream, request_info)
+        return r
+    except Exception as err:
+        error = err
+        raise
+    finally:
+        bytes_received = None
+        if r is not None:
+            if stream:
+                bytes_received = int(r.headers.get('Content-Length', 0)) or None
+            else:
+                bytes_received = len(r.content)
+        _finish_request_hooks(
+            request_info,
+            r.status_code if r is not None else None,
+            bytes_received,
+            error
+        )
+
+def _request_with_retries(url, method, payload, retry, stream, request_info=None):
+    """Sends the request, retrying connection errors and ``ph_consts.RETRY_STATUS_CODES``.
+
+    Returns:
+        requests.Response: the final response.
+    """
+
     url = _ph_connect['base_url'] + url
-    request_func = getattr(requests, method.lower())
-    
+
+    if method.lower() not in ph_consts.HTTP_METHODS:
+        raise ValueError('Incorrect requests action specified')
+
     auth = None
     if 'audit' in url or 'ph_user' in url or _ph_connect['header'] is None:
         auth=(_ph_connect['username'], _ph_connect['password'])
 
-    if request_func is None:
-        raise ValueError('Incorrect requests action specified')
+    retries_left = _ph_connect['max_retries'] if _should_retry(method, retry) else 0
+    attempt = 0
+    while True:
+        request_slots = _ph_connect['request_slots']
+        try:
+            if request_slots is not None:
+                request_slots.acquire()
+            try:
+                r = _get_session().request(
+                    method.upper(),
+                    url,
+                    headers=_ph_connect['header'],
+                    data=payload,
+                    verify=_ph_connect['verify_cert'],
+                    auth=auth,
+                    stream=stream
+                )
+            finally:
+                if request_slots is not None:
+                    request_slots.release()
+        except requests.exceptions.SSLError as err:
+            raise Exception(
+                'Error connecting to API - '
+                'Likely due to the "validate server certificate" option. '
+                'Details: ' + str(err)
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            if attempt >= retries_left:
+                raise Exception(
+                    'Error calling - ' + url + ' - Details: ' + str(err)
+                )
+            time.sleep(_retry_delay(attempt))
+            attempt += 1
+            if request_info is not None:
+                request_info['retries'] = attempt
+            continue
+        except requests.exceptions.RequestException as err:
+            raise Exception(
+                'Error calling - ' + url + ' - Details: ' + str(err)
+            )
+
+        if r.status_code in ph_consts.RETRY_STATUS_CODES and attempt < retries_left:
+            delay = _retry_delay(attempt, r.headers.get('Retry-After'))
+            r.close()
+            time.sleep(delay)
+            attempt += 1
+            if request_info is not None:
+                request_info['retries'] = attempt
+            continue
+
+        return r
+
+def _check_status(url, status_code, reason, results):
+    """Raises for error statuses, unless phantom explained the failure in the body.
+
+    Phantom reports many failures (e.g. item not found, duplicates) as a 4xx status with a
+    ``{'failed': True, 'message': ...}`` body. Those bodies are returned so callers can handle them
+    as they always have. Anything else with an error status raises.
+
+    Returns:
+        dict: ``results`` when the status is not an error or carries a phantom failure body.
+    """
+
+    if status_code < 400:
+        return results
+
+    if status_code < 500 and type(results) is dict and results.get(ph_consts.RESPONSE_FAILED_KEY):
+        return results
+
+    raise Exception(
+        'Error calling - ' + url + ' - \n'
+        'HTTP Status: ' + str(status_code)
+        + ' Reason: ' + str(reason)
+        + ' Details: ' + str(results)[:ph_consts.ERROR_DETAILS_MAX_LENGTH]
+    )
+
+def _should_retry(method, retry=None):
+    """Decides whether a request may be retried. Idempotent methods are retried by default; POSTs
+    only when the caller says so or ``retry_post`` was set in ``setup_connection()``."""
+
+    if retry is not None:
+        return retry
+
+    return method.lower() in ph_consts.IDEMPOTENT_HTTP_METHODS or _ph_connect['retry_post']
+
+def _retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number ``attempt`` (0 based).
+
+    Uses the ``Retry-After`` header value if phantom sent one, otherwise "full jitter" exponential
+    backoff - a random delay between 0 and ``backoff_factor * 2 ** attempt``, capped at ``backoff_max``.
+    """
+
+    delay = _parse_retry_after(retry_after)
+    if delay is not None:
+        return delay
+
+    return random.uniform(
+        0,
+        min(_ph_connect['backoff_max'], _ph_connect['backoff_factor'] * (2 ** attempt))
+    )
+
+def _parse_retry_after(retry_after):
+    """Converts a ``Retry-After`` header (seconds or http date) to seconds. None if missing or unreadable."""
+
+    if not retry_after:
+        return None
 
     try:
-        r = request_func(
-            url,
-            headers=_ph_connect['header'],
-            data=payload,
-            verify=_ph_connect['verify_cert'],
-            auth=auth
-        )
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
 
-        r.raise_for_status
-    except requests.exceptions.SSLError as err:
-        raise Exception(
-            'Error connecting to API - '
-            'Likely due to the "validate server certificate" option. '
-            'Details: ' + str(err)
-        )
-    except requests.exceptions.HTTPError as err:
-        raise Exception(
-            'Error calling - ' + url + ' - \n'
-            'HTTP Status: ' + r.status
-            + 'Reason: ' + r.reason
-            + 'Details: ' + str(err)
-        )
-    except requests.exceptions.RequestException as err:
-        raise Exception(
-            'Error calling - ' + url + ' - Details: ' + str(err)
+    parsed_date = email.utils.parsedate_tz(retry_after)
+    if parsed_date is None:
+        return None
+
+    return max(0.0, email.utils.mktime_tz(parsed_date) - time.time())
+
+### Instrumentation
+_request_hooks = {
+    'pre': [],
+    'post': []
+}
+
+_metrics = {
+    'collector': None
+}
+
+def add_request_hook(pre=None, post=None):
+    """Registers functions called around every request sent to phantom.
+
+    Both are called with a ``request_info`` dict. ``pre`` hooks get ``method``, ``url``, ``endpoint``
+    (the url path with ids replaced, e.g. ``/rest/container/{id}``), ``bytes_sent`` and ``start_time``.
+    ``post`` hooks additionally get ``status`` (None if no response), ``latency`` (seconds,
+    including retries), ``bytes_received`` (None if unknown), ``retries`` and ``error`` (the exception
+    raised, or None). The same dict is passed to the ``pre`` and ``post`` hooks of a request, so
+    hooks may stash their own keys in it.
+
+    Keyword Args:
+        pre (function): called before the request is sent.
+        post (function): called once the request has completed or failed.
+
+    Note:
+        Hooks run on the thread making the request and should be quick. With no hooks registered
+        the only overhead is checking two empty lists.
+
+    Example:
+        Log slow requests::
+
+            def log_slow(request_info):
+                if request_info['latency'] > 1:
+                    print(request_info['method'], request_info['endpoint'], request_info['latency'])
+
+            ph_base.add_request_hook(post=log_slow)
+    """
+
+    if pre is not None:
+        _request_hooks['pre'].append(pre)
+    if post is not None:
+        _request_hooks['post'].append(post)
+
+def remove_request_hook(pre=None, post=None):
+    """Unregisters hooks added with ``add_request_hook()``.
+
+    Keyword Args:
+        pre (function): pre request hook to remove.
+        post (function): post request hook to remove.
+    """
+
+    if pre is not None and pre in _request_hooks['pre']:
+        _request_hooks['pre'].remove(pre)
+    if post is not None and post in _request_hooks['post']:
+        _request_hooks['post'].remove(post)
+
+def enable_metrics(latency_buckets=ph_consts.METRICS_LATENCY_BUCKETS):
+    """Starts collecting per endpoint request metrics with a built in post request hook.
+
+    Keyword Args:
+        latency_buckets (tuple): upper bounds (seconds) of the latency histogram buckets.
+
+    Example:
+        Export the metrics once a minute::
+
+            ph_base.enable_metrics()
+            ...
+            for endpoint, stats in ph_base.metrics_snapshot().items():
+                export(endpoint, stats['count'], stats['latency_sum'], stats['status_codes'])
+    """
+
+    disable_metrics()
+    _metrics['collector'] = _request_metrics(latency_buckets)
+    add_request_hook(post=_metrics['collector'].record)
+
+def disable_metrics():
+    """Stops collecting request metrics and drops those collected."""
+
+    if _metrics['collector'] is not None:
+        remove_request_hook(post=_metrics['collector'].record)
+        _metrics['collector'] = None
+
+def metrics_snapshot(reset=False):
+    """Returns the metrics collected since ``enable_metrics()`` (or the last reset).
+
+    Keyword Args:
+        reset (bool): start counting from zero after taking the snapshot.
+
+    Returns:
+        dict: keyed on ``'METHOD endpoint'`` (e.g. ``'GET /rest/container/{id}'``). Each value has
+        ``count``, ``errors``, ``retries``, ``bytes_sent``, ``bytes_received``, ``status_codes``
+        (status -> count), ``latency_sum``, ``latency_max`` and ``latency_buckets`` (list of
+        ``[upper_bound, count]`` pairs, not cumulative). None if metrics are not enabled.
+    """
+
+    if _metrics['collector'] is None:
+        return None
+
+    return _metrics['collector'].snapshot(reset=reset)
+
+def _endpoint_template(url):
+    """Reduces a relative url to its endpoint - no query string, numeric ids replaced with ``{id}``."""
+
+    return '/'.join(
+        '{id}' if part.isdigit() else part
+        for part in url.partition('?')[0].split('/')
+    )
+
+def _start_request_hooks(url, method, payload):
+    """Builds the ``request_info`` for a request and runs the pre request hooks."""
+
+    request_info = {
+        'method': method.upper(),
+        'url': _ph_connect['base_url'] + url,
+        'endpoint': _endpoint_template(url),
+        'bytes_sent': len(payload) if payload else 0,
+        'retries': 0,
+        'start_time': time.time()
+    }
+
+    for hook in list(_request_hooks['pre']):
+        hook(request_info)
+
+    return request_info
+
+def _finish_request_hooks(request_info, status, bytes_received, error):
+    """Completes ``request_info`` and runs the post request hooks."""
+
+    request_info['status'] = status
+    request_info['bytes_received'] = bytes_received
+    request_info['error'] = error
+    request_info['latency'] = time.time() - request_info['start_time']
+
+    for hook in list(_request_hooks['post']):
+        hook(request_info)
+
+class _request_metrics(object):
+    """Thread safe, per endpoint aggregation of ``request_info`` dicts from the post request hook."""
+
+    def __init__(self, latency_buckets):
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _new_endpoint(self):
+        return {
+            'count': 0,
+            'errors': 0,
+            'retries': 0,
+            'bytes_sent': 0,
+            'bytes_received': 0,
+            'status_codes': {},
+            'latency_sum': 0.0,
+            'latency_max': 0.0,
+            'latency_buckets': [0] * (len(self.latency_buckets) + 1)
+        }
+
+    def record(self, request_info):
+        key = request_info['method'] + ' ' + request_info['endpoint']
+        latency = request_info['latency']
+        bucket = bisect.bisect_left(self.latency_buckets, latency)
+
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = self._new_endpoint()
+            stats['count'] += 1
+            stats['retries'] += request_info['retries']
+            stats['bytes_sent'] += request_info['bytes_sent']
+            stats['bytes_received'] += request_info['bytes_received'] or 0
+            stats['latency_sum'] += latency
+            stats['latency_max'] = max(stats['latency_max'], latency)
+            stats['latency_buckets'][bucket] += 1
+            if request_info['error'] is not None or not request_info['status'] or request_info['status'] >= 400:
+                stats['errors'] += 1
+            if request_info['status']:
+                stats['status_codes'][request_info['status']] = stats['status_codes'].get(request_info['status'], 0) + 1
+
+    def snapshot(self, reset=False):
+        bucket_bounds = list(self.latency_buckets) + [float('inf')]
+        with self._lock:
+            endpoints = self._endpoints
+            if reset:
+                self._endpoints = {}
+            snapshot = {}
+            for key, stats in endpoints.items():
+                endpoint_snapshot = dict(stats)
+                endpoint_snapshot['status_codes'] = dict(stats['status_codes'])
+                endpoint_snapshot['latency_buckets'] = [
+                    [bound, count] for bound, count in zip(bucket_bounds, stats['latency_buckets'])
+                ]
+                snapshot[key] = endpoint_snapshot
+
+        return snapshot
+
+### Response cache
+def enable_cache(
+    ttl=ph_consts.CACHE_DEFAULT_TTL,
+    max_entries=ph_consts.CACHE_DEFAULT_MAX_ENTRIES,
+    max_bytes=ph_consts.CACHE_DEFAULT_MAX_BYTES
+):
+    """Turns on the in-process response cache for ``query()`` (and everything built on it, such as
+    ``ph_container.retrieve_container_json()``).
+
+    Responses are keyed on the normalized query url and kept for ``ttl`` seconds. When either
+    ``max_entries`` or ``max_bytes`` (size of the raw response bodies) is exceeded, the least
+    recently used responses are evicted. Any POST/PUT/DELETE made through the package - e.g.
+    ``_update_record()`` or ``_delete_record()`` - drops cached responses for the same record type
+    and id, along with cached list queries of that record type.
+
+    Keyword Args:
+        ttl (float): seconds a response stays valid. Defaults to 60.
+        max_entries (int): maximum number of cached responses. Defaults to 1024.
+        max_bytes (int): memory budget for cached response bodies. Defaults to 64MB.
+
+    Note:
+        Changes made outside this process (other clients, playbooks) are only picked up once the
+        ``ttl`` expires.
+
+    Example:
+        Cache lookups for a minute and check how well it is working::
+
+            ph_base.enable_cache(ttl=60)
+            ph_container.retrieve_container_json(1069)
+            ph_container.retrieve_container_json(1069) # served from cache
+            print(ph_base.cache_stats()) # {'hits': 1, 'misses': 1, ...}
+    """
+
+    _ph_connect['cache'] = _response_cache(ttl, max_entries, max_bytes)
+
+def disable_cache():
+    """Turns off the response cache and drops everything in it."""
+
+    _ph_connect['cache'] = None
+
+def clear_cache():
+    """Drops every cached response, keeping the cache enabled."""
+
+    if _ph_connect['cache'] is not None:
+        _ph_connect['cache'].clear()
+
+def cache_stats():
+    """Returns the response cache counters.
+
+    Returns:
+        dict: ``hits``, ``misses``, ``evictions`` (LRU/budget), ``expirations`` (ttl),
+        ``invalidations`` (writes), ``entries`` and ``bytes`` - or None if the cache is disabled.
+    """
+
+    if _ph_connect['cache'] is None:
+        return None
+
+    return _ph_connect['cache'].stats()
+
+class _response_cache(object):
+    """Thread safe LRU cache of raw response bodies with a ttl and a memory budget."""
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0
         )
 
+    @staticmethod
+    def _normalize_url(url):
+        path, _, query_string = url.partition('?')
+        return path + '?' + '&'.join(sorted(query_string.split('&')))
+
+    @staticmethod
+    def _record_key(url):
+        """Returns ``(record_type, id)`` for a ``/rest/<record_type>/<id>/...`` url - id is None for list urls."""
+
+        path_parts = url.partition('?')[0].strip('/').split('/')
+        record_type = path_parts[1] if len(path_parts) > 1 else None
+        record_id = path_parts[2] if len(path_parts) > 2 else None
+
+        return (record_type, record_id)
+
+    def get(self, url):
+        key = self._normalize_url(url)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            if entry[0] < time.time():
+                self._bytes -= len(entry[1])
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            # re-insert as most recently used
+            self._entries[key] = entry
+            self._counters['hits'] += 1
+            return entry[1]
+
+    def put(self, url, body):
+        if len(body) > self.max_bytes:
+            return
+
+        key = self._normalize_url(url)
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._bytes -= len(old_entry[1])
+            self._entries[key] = (time.time() + self.ttl, body, self._record_key(url))
+            self._bytes += len(body)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[1])
+                self._counters['evictions'] += 1
+
+    def invalidate_url(self, url):
+        """Drops entries for the record a write url touches, and list queries of its record type."""
+
+        record_type, record_id = self._record_key(url)
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[2][0] == record_type and (entry[2][1] is None or entry[2][1] == record_id):
+                    del self._entries[key]
+                    self._bytes -= len(entry[1])
+                    self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+
+        return stats
+
+def _stream_request(url, method='get', payload=None, retry=None):
+    """Sends a request and decodes the JSON response incrementally as it is read from the socket.
+
+    Yields the elements of the response's ``data`` list (or of the response itself if it is a list)
+    one at a time, so memory use stays proportional to a single record rather than to the whole
+    response.
+
+    Args:
+        url (string): url relative to the phantom base url.
+
+    Keyword Args:
+        method (string): http method. Defaults to GET.
+        payload (string): data to be sent to REST API endpoint.
+        retry (bool): see ``_send_request()``.
+
+    Raises:
+        Exception: Raised on error statuses, phantom failure responses and malformed JSON.
+    """
+
+    r = _perform_request(url, method, payload=payload, retry=retry, stream=True)
     try:
-        results = r.json()
-    except ValueError:
-        results = r.text
+        if r.status_code >= 400:
+            try:
+                results = _loads(r.content)
+            except ValueError:
+                results = r.text
+            results = _check_status(_ph_connect['base_url'] + url, r.status_code, r.reason, results)
+            raise Exception('Error calling - ' + _ph_connect['base_url'] + url + ' - Details: ' + str(results))
 
-    return results
+        for record in _iter_json_records(r.iter_content(chunk_size=ph_consts.STREAM_CHUNK_SIZE)):
+            yield record
+    finally:
+        r.close()
+
+def _iter_json_records(byte_chunks):
+    """Incrementally parses a JSON document from an iterable of byte chunks, yielding the elements of
+    its top level list, or of the ``data`` list of its top level object.
+
+    Raises:
+        Exception: Raised if the document is a phantom failure response or isn't valid JSON.
+    """
+
+    stream = _json_stream(byte_chunks)
+
+    try:
+        if stream.expect('[{') == '{':
+            fields = {}
+            while True:
+                if stream.peek() == '}':
+                    break
+                key = stream.decode_value()
+                stream.expect(':')
+                if key == 'data' and stream.peek() == '[':
+                    break
+                fields[key] = stream.decode_value()
+                if stream.expect(',}') == '}':
+                    break
+
+            if stream.peek() != '[':
+                if fields.get(ph_consts.RESPONSE_FAILED_KEY):
+                    raise Exception('Error in streamed response. Details: ' + str(fields))
+                return
+            stream.expect('[')
+
+        if stream.peek() == ']':
+            return
+        while True:
+            yield stream.decode_value()
+            if stream.expect(',]') == ']':
+                return
+    except ValueError as err:
+        raise Exception('Error decoding streamed response. Details: ' + str(err))
+
+class _json_stream(object):
+    """Text buffer over a stream of utf-8 byte chunks that only keeps the unparsed tail in memory."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, byte_chunks):
+        self._chunks = iter(byte_chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self):
+        """Appends the next chunk to the buffer, dropping what has been parsed. False once the stream is exhausted."""
+
+        if self.eof:
+            return False
+
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            text = self._text_decoder.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+
+        self.buffer += self._text_decoder.decode(b'', True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        """Skips whitespace and returns the next character without consuming it - '' at the end of the stream."""
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more() and self.pos >= len(self.buffer):
+                return ''
+
+    def expect(self, characters):
+        """Consumes and returns the next character, which must be one of ``characters``."""
+
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(
+                'Expected one of ' + characters + ' but found '
+                + (repr(character) if character else 'end of response')
+            )
+        self.pos += 1
+
+        return character
+
+    def decode_value(self):
+        """Decodes the next complete JSON value, reading more of the stream until it is available."""
+
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # a value running to the end of the buffer (e.g. a number) may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.read_more()
 
 #Utility methods  
 def _exists_in_data_set(data_set_name, data_set, data_value):
@@ -150,6 +983,88 @@ def _exists_in_data_set(data_set_name, data_set, data_value):
         )
     return True
 
+def _map_concurrently(func, items, max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY):
+    """Calls ``func`` on every item, up to ``max_concurrency`` at a time.
+
+    A call that raises doesn't stop the others - its result is ``_failed_result()`` of the exception.
+
+    Args:
+        func (function): called with one item.
+        items (list): items to process.
+
+    Keyword Args:
+        max_concurrency (int): maximum number of calls in flight at once. Defaults to 8.
+
+    Returns:
+        list: results of ``func``, in the order of ``items``.
+    """
+
+    items = list(items)
+
+    def call(item):
+        try:
+            return func(item)
+        except Exception as err:
+            return _failed_result(err)
+
+    if max_concurrency <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(items)))
+    try:
+        return list(executor.map(call, items))
+    finally:
+        executor.shutdown()
+
+def _failed_result(err):
+    """Per item result of a failed call in batch operations."""
+
+    return {
+        'id': None,
+        'created': False,
+        ph_consts.RESPONSE_FAILED_KEY: True,
+        ph_consts.RESPONSE_FAILED_MESSAGE_KEY: str(err)
+    }
+
+class _rate_limiter(object):
+    """Spaces out calls to ``wait()`` so that at most ``rate`` of them return per second, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_time = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            scheduled = max(now, self.next_time)
+            self.next_time = scheduled + self.interval
+
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+def _validate_choice(data_set_name, valid_values, data_value):
+    """Checks that a single value is one of ``valid_values`` - a frozenset from ph_consts.
+
+    Args:
+        data_set_name (string): Name of dataset to be used in error message if the value is not valid.
+        valid_values (frozenset): valid values.
+        data_value (string): value to check.
+
+    Raises:
+        Exception: Raises exception if the value is not valid.
+
+    Returns:
+        (bool): True if the value is valid.
+    """
+
+    if data_value not in valid_values:
+        raise Exception(
+            str(data_value) + ' is not a valid ' + data_set_name + ' value.'
+            + ' Select from - ' + str(tuple(sorted(valid_values)))
+        )
+    return True
+
 #modify record
 def _update_record(record_type, id, data):
     """Used to update existing records
@@ -165,8 +1080,9 @@ def _update_record(record_type, id, data):
     response = _send_request(
         '/rest/' + record_type + '/' + str(id),
         'post',
-        payload=json.dumps(data),
-        content_type='application/json'
+        payload=_dumps(data),
+        content_type='application/json',
+        retry=True
     )
 
     return response
@@ -188,6 +1104,174 @@ def _delete_record(record_type, id):
     )
 
     return response
+
+def bulk_delete(
+    record_type,
+    filters,
+    dry_run=False,
+    max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY,
+    rate=None,
+    progress=None,
+    page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE
+):
+    """Deletes every record matching ``filters``.
+
+    Matching ids are read page by page (by ascending id, so deleting records doesn't shift the pages still
+    to be read) and deleted with ``_delete_record`` by a pool of ``max_concurrency`` threads.
+
+    Args:
+        record_type (string): type of record to delete (i.e. container, artifact, etc.)
+        filters (list): list of dictionaries describing filter critera - see ``query()``
+
+    Keyword Args:
+        dry_run (bool): only count the matching records. Defaults to False.
+        max_concurrency (int): maximum number of deletes in flight at once. Defaults to 8.
+        rate (float): maximum number of deletes started per second. Defaults to None (no limit).
+        progress (function): called with a copy of the summary (see Returns) every 100 records and
+            once at the end.
+        page_size (int): number of ids read per request. Defaults to 1000.
+
+    Returns:
+        dict: summary of the operation -
+        ``{'matched': n, 'succeeded': n, 'failed': n, 'failures': {id: message}, 'dry_run': bool}``
+
+    Example:
+        Delete containers closed before 2018, at most 20 per second::
+
+            ph_base.bulk_delete(
+                'container',
+                [
+                    {'field': 'status', 'type': 'exact', 'value': 'closed'},
+                    {'field': 'close_time', 'type': 'lt', 'value': '2018-01-01T00:00:00Z'}
+                ],
+                rate=20,
+                progress=lambda summary: print(summary['succeeded'], 'deleted')
+            )
+
+    Note:
+        Call with ``dry_run=True`` first to see how many records would be deleted.
+    """
+
+    return _bulk_apply(
+        record_type,
+        filters,
+        lambda record_id: _delete_record(record_type, record_id),
+        dry_run,
+        max_concurrency,
+        rate,
+        progress,
+        page_size
+    )
+
+def bulk_update(
+    record_type,
+    filters,
+    data,
+    dry_run=False,
+    max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY,
+    rate=None,
+    progress=None,
+    page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE
+):
+    """Applies the same update to every record matching ``filters``.
+
+    Works like ``bulk_delete()``, updating each record with ``_update_record``. Updates that take a
+    record out of ``filters`` (e.g. closing records matched on status) are fine.
+
+    Args:
+        record_type (string): type of record to update (i.e. container, artifact, etc.)
+        filters (list): list of dictionaries describing filter critera - see ``query()``
+        data (dict): fields to update on every record.
+
+    Keyword Args:
+        See ``bulk_delete()``.
+
+    Returns:
+        dict: summary of the operation - see ``bulk_delete()``.
+
+    Example:
+        Close every new container with the ``test`` label::
+
+            ph_base.bulk_update(
+                'container',
+                [
+                    {'field': 'label', 'type': 'exact', 'value': 'test'},
+                    {'field': 'status', 'type': 'exact', 'value': 'new'}
+                ],
+                {'status': 'closed'}
+            )
+    """
+
+    return _bulk_apply(
+        record_type,
+        filters,
+        lambda record_id: _update_record(record_type, record_id, data),
+        dry_run,
+        max_concurrency,
+        rate,
+        progress,
+        page_size
+    )
+
+def _bulk_apply(record_type, filters, operation, dry_run, max_concurrency, rate, progress, page_size):
+    """Calls ``operation`` with the id of every record matching ``filters``. See ``bulk_delete()``."""
+
+    summary = {
+        'matched': 0,
+        'succeeded': 0,
+        'failed': 0,
+        'failures': {},
+        'dry_run': dry_run
+    }
+
+    if dry_run:
+        summary['matched'] = iter_query(record_type, filters=filters, page_size=1, pretty=False).count
+        if progress is not None:
+            progress(dict(summary))
+        return summary
+
+    limiter = _rate_limiter(rate) if rate else None
+
+    def apply(record_id):
+        if limiter is not None:
+            limiter.wait()
+        return operation(record_id)
+
+    def finish(record_id, future):
+        try:
+            response = future.result()
+            if type(response) is dict and response.get(ph_consts.RESPONSE_FAILED_KEY):
+                raise Exception(response.get(ph_consts.RESPONSE_FAILED_MESSAGE_KEY, str(response)))
+            summary['succeeded'] += 1
+        except Exception as err:
+            summary['failed'] += 1
+            summary['failures'][record_id] = str(err)
+
+        if progress is not None and (summary['succeeded'] + summary['failed']) % ph_consts.BULK_PROGRESS_INTERVAL == 0:
+            progress(dict(summary, failures=dict(summary['failures'])))
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    pending = collections.deque()
+    try:
+        for page in _walk_keyset(record_type, filters, 0, page_size=page_size, pretty=False):
+            for record in page:
+                summary['matched'] += 1
+                pending.append((record['id'], executor.submit(apply, record['id'])))
+                if len(pending) >= max_concurrency * 2:
+                    finish(*pending.popleft())
+
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        # a page failed to load - don't start the operations queued behind it
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown()
+
+    if progress is not None:
+        progress(dict(summary, failures=dict(summary['failures'])))
+
+    return summary
     
 #query api calls
 def _format_filters(filters):
@@ -239,7 +1323,8 @@ def query(
     page=None,
     page_size=0,
     pretty=True, 
-    include_expensive=False
+    include_expensive=False,
+    use_cache=True
 ):
     """Allows for running queries against Phantom.
 
@@ -257,6 +1342,8 @@ def query(
         page_size (int): if paginated results are desired, this indicates number of recrods returned per page
         pretty (bool): should "pretty" versions of data be returned? This adds _pretty_... values to results. (e.g. returns nicely formated date time strings, instead of isoformat)
         include_expensive (bool): include even more details that are more resource intensive.
+        use_cache (bool): allow the response to come from (and be stored in) the response cache, when
+            it is turned on with ``enable_cache()``. Defaults to True.
 
     Example:
         The filtering capability is much simplified from using the native api. In this case just send filters in a list of dicts like so - 
@@ -272,6 +1359,45 @@ def query(
             )
     """
 
+    response = _send_request(
+        _build_query_url(
+            query_type,
+            order=order,
+            filters=filters,
+            sort=sort,
+            query_id=query_id,
+            detail=detail,
+            pseudo_field=pseudo_field,
+            page=page,
+            page_size=page_size,
+            pretty=pretty,
+            include_expensive=include_expensive
+        ),
+        'GET',
+        cache=use_cache
+    )
+
+    return response
+
+def _build_query_url(
+    query_type,
+    order='desc',
+    filters=[],
+    sort=None,
+    query_id=None,
+    detail=None,
+    pseudo_field=None,
+    page=None,
+    page_size=0,
+    pretty=True,
+    include_expensive=False
+):
+    """Builds the relative REST url for a query. See ``query()`` for argument details.
+
+    Returns:
+        string: url (including query string) relative to the phantom base url.
+    """
+
     url = '/rest/' + query_type
 
     if query_id:
@@ -296,12 +1422,462 @@ def query(
     if len(filters) > 0:
         url_query_string += _format_filters(filters)
 
-    response = _send_request(
-        url + url_query_string,
-        'GET'
+    return url + url_query_string
+
+def iter_query(
+    query_type,
+    order='desc',
+    filters=[],
+    sort=None,
+    page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE,
+    pretty=True,
+    include_expensive=False,
+    workers=None,
+    read_ahead=None
+):
+    """Lazily runs a query against Phantom, fetching one page at a time.
+
+    Takes the same ``filters``/``sort``/``order`` arguments as ``query()``, but instead of
+    asking phantom for every record in one response, records are requested ``page_size``
+    at a time and yielded one by one. Only a single page is held in memory at any point.
+
+    Args:
+        query_type (string): type of data to be queried (see ``query()``)
+
+    Keyword Args:
+        order (string): sort order for query results (asc, desc)
+        filters (list): list of dictionaries describing filter critera - see ``query()``
+        sort (string): sort field to be used in query results
+        page_size (int): number of records requested per page. Defaults to 1000.
+        pretty (bool): should "pretty" versions of data be returned?
+        include_expensive (bool): include even more details that are more resource intensive.
+        workers (int): if greater than 1, pages after the first are fetched in parallel by this many threads.
+        read_ahead (int): number of pages fetched ahead of the page being consumed when ``workers``
+            is set. Defaults to ``workers``.
+
+    Note:
+        Records are always yielded in page order, parallel or not. The ``max_concurrency`` setting of
+        ``setup_connection()`` caps the total number of requests in flight across all queries.
+
+    Returns:
+        ph_query_iterator: iterable of records. ``count`` and ``num_pages`` are available
+        from the first page.
+
+    Example:
+        Walk every closed container without loading them all at once::
+
+            results = ph_base.iter_query(
+                'container',
+                filters=[{'field': 'status', 'type': 'exact', 'value': 'closed'}]
+            )
+            print(results.count)
+            for container in results:
+                print(container['id'])
+    """
+
+    return ph_query_iterator(
+        query_type,
+        order=order,
+        filters=filters,
+        sort=sort,
+        page_size=page_size,
+        pretty=pretty,
+        include_expensive=include_expensive,
+        workers=workers,
+        read_ahead=read_ahead
     )
 
-    return response
+class ph_query_iterator(object):
+    """Iterates over the records of a paged query. Normally created with ``iter_query()``.
+
+    Args:
+        query_type (string): type of data to be queried (see ``query()``)
+
+    Keyword Args:
+        order (string): sort order for query results (asc, desc)
+        filters (list): list of dictionaries describing filter critera - see ``query()``
+        sort (string): sort field to be used in query results
+        page_size (int): number of records requested per page.
+        pretty (bool): should "pretty" versions of data be returned?
+        include_expensive (bool): include even more details that are more resource intensive.
+        workers (int): number of threads fetching pages in parallel. Defaults to None (sequential).
+        read_ahead (int): number of pages prefetched ahead of the consumer. Defaults to ``workers``.
+
+    Attributes:
+        count (int): total number of records matching the query - read from the first page.
+        num_pages (int): number of pages of ``page_size`` records - read from the first page.
+    """
+
+    def __init__(
+        self,
+        query_type,
+        order='desc',
+        filters=[],
+        sort=None,
+        page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE,
+        pretty=True,
+        include_expensive=False,
+        workers=None,
+        read_ahead=None
+    ):
+        if not page_size or page_size < 1:
+            raise ValueError('page_size must be at least 1 when iterating over a query.')
+
+        self.query_type = query_type
+        self.order = order
+        self.filters = filters
+        self.sort = sort
+        self.page_size = page_size
+        self.pretty = pretty
+        self.include_expensive = include_expensive
+        self.workers = workers
+        self.read_ahead = read_ahead or workers
+        self._first_page = None
+        self._count = None
+        self._num_pages = None
+
+    @property
+    def count(self):
+        self._load_first_page()
+        return self._count
+
+    @property
+    def num_pages(self):
+        self._load_first_page()
+        return self._num_pages
+
+    def __iter__(self):
+        self._load_first_page()
+        first_page = self._first_page if self._first_page is not None else self.fetch_page(0)
+        # hand the first page over to this iteration so it can be released once consumed
+        self._first_page = None
+
+        if self.workers and self.workers > 1 and self._num_pages > 1:
+            for record in self._iter_parallel(first_page):
+                yield record
+            return
+
+        for record in first_page['data']:
+            yield record
+
+        page_num = 1
+        while page_num < self._num_pages:
+            page = self.fetch_page(page_num)
+            if not page['data']:
+                break
+            for record in page['data']:
+                yield record
+            page_num += 1
+
+    def _iter_parallel(self, first_page):
+        """Yields records in page order while up to ``read_ahead`` later pages are fetched by the worker pool."""
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        pending = collections.deque()
+        next_page = 1
+
+        try:
+            while next_page < self._num_pages and len(pending) < self.read_ahead:
+                pending.append(executor.submit(self.fetch_page, next_page))
+                next_page += 1
+
+            for record in first_page['data']:
+                yield record
+
+            while pending:
+                page = pending.popleft().result()
+                if next_page < self._num_pages:
+                    pending.append(executor.submit(self.fetch_page, next_page))
+                    next_page += 1
+                for record in page['data']:
+                    yield record
+        finally:
+            # consumer stopped early or a page failed - don't fetch pages nobody will read
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def fetch_page(self, page_num):
+        """Fetches a single page of the query.
+
+        Args:
+            page_num (int): page number to fetch (phantom pages start at 0)
+
+        Raises:
+            Exception: Raises exception if phantom does not return a page of results.
+
+        Returns:
+            dict: the raw page returned by phantom (``count``, ``num_pages`` and ``data``).
+        """
+
+        response = query(
+            self.query_type,
+            order=self.order,
+            filters=self.filters,
+            sort=self.sort,
+            page=page_num,
+            page_size=self.page_size,
+            pretty=self.pretty,
+            include_expensive=self.include_expensive,
+            use_cache=False
+        )
+
+        if type(response) is not dict or 'data' not in response:
+            raise Exception(
+                'Error querying ' + self.query_type + ' page ' + str(page_num)
+                + '. Details: ' + str(response)
+            )
+
+        return response
+
+    def _load_first_page(self):
+        if self._count is None:
+            self._first_page = self.fetch_page(0)
+            self._count = self._first_page.get('count', len(self._first_page['data']))
+            self._num_pages = self._first_page.get('num_pages', 1)
+
+def stream_query(
+    query_type,
+    order='desc',
+    filters=[],
+    sort=None,
+    query_id=None,
+    detail=None,
+    pseudo_field=None,
+    page=None,
+    page_size=0,
+    pretty=True,
+    include_expensive=False
+):
+    """Runs a query like ``query()``, but decodes the response as it arrives and yields the records
+    in its ``data`` list one at a time.
+
+    Unlike ``query()``, the response body is never held in memory as a whole - neither as bytes nor
+    as python objects - so even a ``page_size=0`` (everything) query only needs memory for one record.
+    Takes the same arguments as ``query()``.
+
+    Returns:
+        generator: yields one record at a time. The request is sent when iteration starts.
+
+    Example:
+        Stream every artifact of a container::
+
+            for artifact in ph_base.stream_query('container', query_id=1069, pseudo_field='artifacts'):
+                print(artifact['id'])
+    """
+
+    return _stream_request(
+        _build_query_url(
+            query_type,
+            order=order,
+            filters=filters,
+            sort=sort,
+            query_id=query_id,
+            detail=detail,
+            pseudo_field=pseudo_field,
+            page=page,
+            page_size=page_size,
+            pretty=pretty,
+            include_expensive=include_expensive
+        )
+    )
+
+def scan(
+    query_type,
+    filters=[],
+    shards=4,
+    workers=None,
+    page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE,
+    pretty=True,
+    include_expensive=False
+):
+    """Walks every record matching a query using id ranges instead of page offsets.
+
+    Deep ``page=`` offsets get slower on the server the further into the results they go. ``scan()``
+    instead splits the id space of the matching records into ``shards`` ranges
+    (``_filter_id__gt``/``_filter_id__lte``) and walks each range by keyset - every request asks for
+    the next ``page_size`` records with an id greater than the last one seen. Shards are walked in
+    parallel by ``workers`` threads.
+
+    Args:
+        query_type (string): type of data to be queried (see ``query()``)
+
+    Keyword Args:
+        filters (list): list of dictionaries describing filter critera - see ``query()``
+        shards (int): number of id ranges to split the scan into. Defaults to 4.
+        workers (int): number of threads walking shards at once. Defaults to ``shards``.
+        page_size (int): number of records requested per request. Defaults to 1000.
+        pretty (bool): should "pretty" versions of data be returned?
+        include_expensive (bool): include even more details that are more resource intensive.
+
+    Note:
+        Records are yielded in ascending id order within a shard, but shards are interleaved. Use
+        ``iter_query()`` if a global sort order is needed.
+
+    Returns:
+        generator: yields one record at a time.
+
+    Example:
+        Export every artifact of a label::
+
+            for artifact in ph_base.scan(
+                'artifact',
+                filters=[{'field': 'label', 'type': 'exact', 'value': 'email'}],
+                shards=8
+            ):
+                export(artifact)
+    """
+
+    if not page_size or page_size < 1:
+        raise ValueError('page_size must be at least 1 when scanning a query.')
+
+    id_range = _id_bounds(query_type, filters)
+    if id_range is None:
+        return
+
+    shard_ranges = _split_id_range(id_range[0] - 1, id_range[1], shards)
+    workers = min(workers or len(shard_ranges), len(shard_ranges))
+
+    walk_args = {
+        'page_size': page_size,
+        'pretty': pretty,
+        'include_expensive': include_expensive
+    }
+
+    if workers <= 1:
+        for lower, upper in shard_ranges:
+            for page in _walk_keyset(query_type, filters, lower, upper, **walk_args):
+                for record in page:
+                    yield record
+        return
+
+    pages = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def walk_shard(shard_range):
+        try:
+            for page in _walk_keyset(query_type, filters, shard_range[0], shard_range[1], stop=stop, **walk_args):
+                _put_unless_stopped(pages, ('page', page), stop)
+        except Exception as err:
+            _put_unless_stopped(pages, ('error', err), stop)
+        _put_unless_stopped(pages, ('done', None), stop)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for shard_range in shard_ranges:
+            executor.submit(walk_shard, shard_range)
+
+        shards_left = len(shard_ranges)
+        while shards_left:
+            kind, item = pages.get()
+            if kind == 'done':
+                shards_left -= 1
+            elif kind == 'error':
+                raise item
+            else:
+                for record in item:
+                    yield record
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+def _id_bounds(query_type, filters):
+    """Finds the lowest and highest id of the records matching ``filters``.
+
+    Returns:
+        tuple: ``(min_id, max_id)`` or None if nothing matches.
+    """
+
+    bounds = []
+    for order in ('asc', 'desc'):
+        response = query(query_type, order=order, filters=filters, sort='id', page_size=1, pretty=False, use_cache=False)
+        if type(response) is not dict or 'data' not in response:
+            raise Exception('Error querying ' + query_type + ' id range. Details: ' + str(response))
+        if not response['data']:
+            return None
+        bounds.append(response['data'][0]['id'])
+
+    return (bounds[0], bounds[1])
+
+def _split_id_range(lower, upper, shards):
+    """Splits the id range ``(lower, upper]`` into at most ``shards`` contiguous ranges."""
+
+    shards = max(1, min(shards, upper - lower))
+    step = -(-(upper - lower) // shards)
+
+    return [
+        (shard_lower, min(shard_lower + step, upper))
+        for shard_lower in range(lower, upper, step)
+    ]
+
+def _walk_keyset(
+    query_type,
+    filters,
+    lower,
+    upper=None,
+    page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE,
+    pretty=True,
+    include_expensive=False,
+    stop=None
+):
+    """Yields pages (lists of records) with ``lower < id <= upper`` in ascending id order, always
+    asking for the first page after the last id seen rather than an offset.
+
+    Args:
+        query_type (string): type of data to be queried
+        filters (list): filters applied in addition to the id range
+        lower (int): exclusive lower id bound
+
+    Keyword Args:
+        upper (int): inclusive upper id bound. Defaults to None (no upper bound).
+        page_size (int): number of records per request.
+        pretty (bool): should "pretty" versions of data be returned?
+        include_expensive (bool): include even more details that are more resource intensive.
+        stop (threading.Event): stop walking once set.
+    """
+
+    last_id = lower
+    while stop is None or not stop.is_set():
+        range_filters = [{'field': 'id', 'type': 'gt', 'value': last_id}]
+        if upper is not None:
+            range_filters.append({'field': 'id', 'type': 'lte', 'value': upper})
+
+        response = query(
+            query_type,
+            order='asc',
+            filters=list(filters) + range_filters,
+            sort='id',
+            page_size=page_size,
+            pretty=pretty,
+            include_expensive=include_expensive,
+            use_cache=False
+        )
+
+        if type(response) is not dict or 'data' not in response:
+            raise Exception(
+                'Error scanning ' + query_type + ' after id ' + str(last_id)
+                + '. Details: ' + str(response)
+            )
+
+        page = response['data']
+        if page:
+            yield page
+        if len(page) < page_size:
+            break
+
+        last_id = page[-1]['id']
+
+def _put_unless_stopped(target_queue, item, stop):
+    """Puts ``item`` on a bounded queue, giving up if ``stop`` is set while waiting for room."""
+
+    while not stop.is_set():
+        try:
+            target_queue.put(item, timeout=ph_consts.QUEUE_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+
+    return False
 
 def search(
     query,
@@ -329,7 +1905,8 @@ def get_audit_data(
     audit_format='json',
     sort='desc',
     start=None,
-    end=None
+    end=None,
+    stream=False
 ):
     """Retrieves audit 
     
@@ -339,6 +1916,8 @@ def get_audit_data(
         sort (string): sort order - defaults to desc
         start (string): start date
         end (string): end date
+        stream (bool): if True (json format only), return a generator that decodes the audit records
+            as they are read from phantom instead of loading the whole response.
 
     Notes:
         * if start and end dates aren't supplied defaults to last 30 days (i think...)
@@ -365,6 +1944,9 @@ def get_audit_data(
     if end:
         url += '&end=' + end
 
+    if stream:
+        return _stream_request(url)
+
     response = _send_request(
         url,
         'get'
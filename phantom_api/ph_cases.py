@@ -1,4 +1,3 @@
-import json
 from phantom_api import ph_base
 from phantom_api import ph_consts
 
@@ -34,7 +33,7 @@ class ph_case(object):
         response = ph_base._send_request(
                     '/rest/workflow_template',
                     'post',
-                    payload=json.dumps(self.render_dictionary()),
+                    payload=ph_base._dumps(self.render_dictionary()),
                     content_type='application/json'
                 )
 
@@ -187,7 +186,7 @@ class ph_phase(object):
         response = ph_base._send_request(
             '/rest/workflow_phase_template',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
@@ -327,7 +326,7 @@ class ph_task(object):
         response = ph_base._send_request(
             '/rest/workflow_task_template',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
@@ -405,7 +404,7 @@ class ph_task(object):
         response = ph_base._send_request(
             '/rest/workflow_task_template/' + str(task_id),
             'post',
-            payload=json.dumps(task_json),
+            payload=ph_base._dumps(task_json),
             content_type='application/json'
         )
 
@@ -1,3 +1,88 @@
+HTTP_METHODS = (
+    'get',
+    'post',
+    'put',
+    'delete',
+    'head',
+    'patch',
+    'options'
+)
+
+IDEMPOTENT_HTTP_METHODS = (
+    'get',
+    'put',
+    'delete',
+    'head',
+    'options'
+)
+
+RETRY_STATUS_CODES = (
+    429,
+    502,
+    503,
+    504
+)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_BACKOFF_MAX = 30
+
+RESPONSE_FAILED_KEY = 'failed'
+RESPONSE_FAILED_MESSAGE_KEY = 'message'
+ERROR_DETAILS_MAX_LENGTH = 500
+
+QUERY_DEFAULT_PAGE_SIZE = 1000
+
+QUEUE_POLL_INTERVAL = 0.5
+
+INGEST_DEFAULT_WORKERS = 8
+INGEST_QUEUE_SIZE_PER_WORKER = 4
+
+BATCH_DEFAULT_CONCURRENCY = 8
+BULK_PROGRESS_INTERVAL = 100
+
+UPDATE_BUFFER_DEFAULT_WINDOW = 1.0
+UPDATE_BUFFER_DEFAULT_MAX_PENDING = 1000
+
+INDEX_BLOOM_ERROR_RATE = 0.001
+INDEX_SNAPSHOT_VERSION = 2
+# snapshot versions load_snapshot() can read - version 1 kept containers as a json object (string keys)
+INDEX_SNAPSHOT_VERSIONS = frozenset((1, 2))
+
+JOURNAL_STATE_PENDING = 'pending'
+JOURNAL_STATE_DONE = 'done'
+# left out of the content hash of items without a source_data_identifier when they hold the
+# constructor defaults, which are set at import time and so differ in every process
+JOURNAL_DEFAULT_TIME_FIELDS = ('open_time', 'start_time', 'end_time')
+
+JSON_BACKEND_ORJSON = 'orjson'
+JSON_BACKEND_STDLIB = 'json'
+JSON_BACKENDS = (JSON_BACKEND_ORJSON, JSON_BACKEND_STDLIB)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+METRICS_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10
+)
+
+CACHE_DEFAULT_TTL = 60
+CACHE_DEFAULT_MAX_ENTRIES = 1024
+CACHE_DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+ASYNC_DEFAULT_MAX_CONCURRENCY = 100
+ASYNC_DEFAULT_POOL_SIZE = 100
+
 QUERY_TYPES = (
     'action_run',
     'artifact',
@@ -155,11 +240,36 @@ CONTAINER_PIN_STYLE = (
     'red'
 )
 
+# the tables above as frozensets, for constant time validation of single values
+KILL_CHAIN_VALUES = frozenset(KILL_CHAIN_LIST)
+ARTIFACT_SEVERITY_VALUES = frozenset(ARTIFACT_SEVERITY)
+CONTAINER_SENSITIVITY_VALUES = frozenset(CONTAINER_SENSITIVITY)
+CONTAINER_STATUS_VALUES = frozenset(CONTAINER_STATUS)
+CONTAINER_PIN_TYPE_VALUES = frozenset(CONTAINER_PIN_TYPE)
+CONTAINER_PIN_STYLE_VALUES = frozenset(CONTAINER_PIN_STYLE)
+
 ACTION_SUCCESS_KEY = 'success'
 ACTION_STATUS_KEY = 'status'
 ACTION_FAILED_MESSAGE_KEY = 'message'
 ACTION_RUN_ID = 'action_run_id'
 ACTION_CANCEL_FAILED_KEY = 'failed'
+ACTION_WAIT_POLL_INTERVAL = 2.0
+
+APP_RUN_RESULT_DATA_KEY = 'result_data'
+APP_RUN_RESULT_SUMMARY_KEY = 'result_summary'
+APP_RUN_PAGE_SIZE = 100
+# fields kept by ph_action_results.summaries() - everything needed for status and success counts
+APP_RUN_SUMMARY_FIELDS = (
+    'id',
+    'action_run_id',
+    'app_id',
+    'asset_id',
+    'status',
+    'message',
+    'result_summary',
+    'start_time',
+    'end_time'
+)
 
 PLAYBOOK_RUN_ID = 'playbook_run_id'
 PLAYBOOK_FAILED_MESSAGE_KEY = 'message'
@@ -175,6 +285,7 @@ ARTIFACT_FAILED_MESSAGE_KEY = 'message'
 ARTIFACT_DUPLICATE_MESSAGE = 'artifact already exists'
 ARTIFACT_EXISTING_ID = 'existing_artifact_id'
 ARTIFACT_NEW_ID = 'id'
+ARTIFACT_BATCH_SIZE = 100
 
 CONTAINER_FAILED_KEY = 'failed'
 CONTAINER_SUCCESS_KEY = 'success'
@@ -182,6 +293,8 @@ CONTAINER_FAILED_MESSAGE_KEY = 'message'
 CONTAINER_DUPLICATE_MESSAGE = 'duplicate with source_data_identifier'
 CONTAINER_EXISTING_ID = 'existing_container_id'
 CONTAINER_NEW_ID = 'id'
+CONTAINER_ARTIFACTS_KEY = 'artifacts'
+CONTAINER_EMBEDDED_ARTIFACT_LIMIT = 500
 
 USER_SUCCESS_KEY = 'success'
 USER_FAILED_MESSAGE_KEY = 'message'
@@ -211,10 +324,31 @@ ACTION_FAILED_STATUS = 'failed'
 ACTION_PENDING_STATUS = 'pending'
 ACTION_RUNNING_STATUS = 'running'
 ACTION_SUCCESS_STATUS = 'success'
+ACTION_CANCELLED_STATUS = 'cancelled'
+ACTION_TERMINAL_STATUSES = frozenset((ACTION_SUCCESS_STATUS, ACTION_FAILED_STATUS, ACTION_CANCELLED_STATUS))
 
 PLAYBOOK_FAILED_STATUS = 'failed'
 PLAYBOOK_RUNNING_STATUS = 'running'
 PLAYBOOK_SUCCESS_STATUS = 'success'
+PLAYBOOK_CANCELLED_STATUS = 'cancelled'
+PLAYBOOK_TERMINAL_STATUSES = frozenset((PLAYBOOK_SUCCESS_STATUS, PLAYBOOK_FAILED_STATUS, PLAYBOOK_CANCELLED_STATUS))
+
+RUN_STATUS_KEY = 'status'
+RUN_TERMINAL_STATUSES = {
+    'action_run': ACTION_TERMINAL_STATUSES,
+    'playbook_run': PLAYBOOK_TERMINAL_STATUSES
+}
+# ids per _filter_id__in status query - keeps the url well under common length limits
+RUN_STATUS_IDS_PER_QUERY = 100
+
+SCHEDULER_MIN_INTERVAL = 0.5
+SCHEDULER_MAX_INTERVAL = 30.0
+# completion time assumed for a kind of run until one has been seen finishing
+SCHEDULER_EXPECTED_DURATION = 10.0
+# fraction of the overrun waited between polls of a run older than expected
+SCHEDULER_BACKOFF_FACTOR = 0.5
+# weight of the newest completion time in the running average
+SCHEDULER_DURATION_WEIGHT = 0.3
 
 USER_PERMISSION_OBJECT_NAMES = (
     'apps',
@@ -1,5 +1,4 @@
 from datetime import datetime
-import json
 from phantom_api import ph_base
 from phantom_api import ph_consts
 
@@ -11,7 +10,7 @@ class ph_container(object):
         name (string): name of container
     
     Keyword Args:
-        artifacts (list): list of dictionaries describing artifacts pertaining to this container. Easier to save container, and then save artifacts to it.
+        artifacts (list): list of ``ph_artifact`` objects or dictionaries describing artifacts pertaining to this container. They are created along with the container by ``save()``.
         asset_id (list): id of asset ingesting this container
         close_time (list): date of container close (isoformat)
         custom_fields (dict): dictionary of custom cef fields
@@ -42,6 +41,54 @@ class ph_container(object):
             print(container.id) # prints the id of newly saved container
     """
 
+    __slots__ = (
+        'label',
+        'name',
+        'artifacts',
+        'id',
+        'asset_id',
+        'close_time',
+        'custom_fields',
+        'data',
+        'description',
+        'due_time',
+        'end_time',
+        'ingest_app_id',
+        'kill_chain',
+        'owner_id',
+        'run_automation',
+        'sensitivity',
+        'severity',
+        'source_data_identifier',
+        'start_time',
+        'open_time',
+        'status',
+        'tags'
+    )
+
+    # fields rendered only when set, and fields that must hold one of a known set of values
+    _optional_fields = (
+        'asset_id',
+        'close_time',
+        'due_time',
+        'end_time',
+        'ingest_app_id',
+        'kill_chain',
+        'owner_id',
+        'severity',
+        'sensitivity',
+        'source_data_identifier',
+        'start_time',
+        'open_time',
+        'status'
+    )
+    _choice_fields = (
+        ('kill_chain', 'kill chain', ph_consts.KILL_CHAIN_VALUES),
+        ('severity', 'severity', ph_consts.ARTIFACT_SEVERITY_VALUES),
+        ('sensitivity', 'sensitivity', ph_consts.CONTAINER_SENSITIVITY_VALUES),
+        ('status', 'status', ph_consts.CONTAINER_STATUS_VALUES)
+    )
+
     def __init__(
         self,
         label,
@@ -78,45 +125,233 @@ class ph_container(object):
         self.due_time = due_time
         self.end_time = end_time
         self.ingest_app_id = ingest_app_id
-        if kill_chain and ph_base._exists_in_data_set('kill chain', ph_consts.KILL_CHAIN_LIST, kill_chain):
+        if kill_chain and ph_base._validate_choice('kill chain', ph_consts.KILL_CHAIN_VALUES, kill_chain):
             self.kill_chain = kill_chain
         else:
             self.kill_chain = None
         self.owner_id = owner_id
         self.run_automation = run_automation
-        if sensitivity and ph_base._exists_in_data_set('sensitivity', ph_consts.CONTAINER_SENSITIVITY, sensitivity):
+        if sensitivity and ph_base._validate_choice('sensitivity', ph_consts.CONTAINER_SENSITIVITY_VALUES, sensitivity):
             self.sensitivity = sensitivity
         else:
             self.sensitivity = None
-        if severity and ph_base._exists_in_data_set('severity', ph_consts.ARTIFACT_SEVERITY, severity):
+        if severity and ph_base._validate_choice('severity', ph_consts.ARTIFACT_SEVERITY_VALUES, severity):
             self.severity = severity
+        else:
+            self.severity = None
         self.source_data_identifier = source_data_identifier
         self.start_time = start_time
         self.open_time = open_time
-        if status and ph_base._exists_in_data_set('status', ph_consts.CONTAINER_STATUS, status):
+        if status and ph_base._validate_choice('status', ph_consts.CONTAINER_STATUS_VALUES, status):
             self.status = status
+        else:
+            self.status = None
         self.tags = tags
 
-    def save(self):
+    def save(
+        self,
+        artifact_embed_limit=ph_consts.CONTAINER_EMBEDDED_ARTIFACT_LIMIT,
+        artifact_batch_size=ph_consts.ARTIFACT_BATCH_SIZE,
+        index=None
+    ):
         """Saves container. 
 
         Sets the container's id. If container already exists, just sets id of object.
+
+        Artifacts in ``artifacts`` are created with the container, in the same request. ``ph_artifact``
+        objects have their ``id`` (and ``container_id``) set once saved. If there are more than
+        ``artifact_embed_limit`` of them, the rest are saved after the container with
+        ``ph_artifact.save_many()``.
+
+        Keyword Args:
+            artifact_embed_limit (int): maximum number of ``ph_artifact`` objects sent in the container
+                request. Defaults to 500.
+            artifact_batch_size (int): batch size for artifacts saved after the container. Defaults to 100.
+            index (ph_sdi_index): if the index knows the container's ``source_data_identifier``, the
+                container is not posted - only its ``ph_artifact`` objects that the index doesn't know are
+                saved. Saved containers and artifacts are added to the index.
         
         Raises:
             Exception: Raises exception if container fails to save.
         
         Returns:
             dict: Returns a dict indicating if the container was saved and the new id. ``{'id': id_number, 'created', True_or_False}``
+            If ``artifacts`` holds ``ph_artifact`` objects, an ``artifacts`` key lists their results, in
+            order, as returned by ``ph_artifact.save_many()``.
+
+        Example:
+            Create a container and its artifacts in one go::
+
+                artifacts = [ph_artifact({'sourceAddress': ip}, None, 'event') for ip in ips]
+                container = ph_container('events', 'Suspicious logins', artifacts=artifacts)
+                container.save()
+                print([artifact.id for artifact in artifacts])
         """
 
+        if index is not None:
+            existing_id = index.container_id(self.source_data_identifier)
+            if existing_id:
+                return self._save_known_container(existing_id, artifact_batch_size, index)
 
+        embedded_artifacts, remaining_artifacts = self._split_artifacts(artifact_embed_limit)
+
+        # phantom de-duplicates containers on source_data_identifier, so those posts are safe to retry
         response = ph_base._send_request(
             '/rest/container',
             'post',
-            payload=json.dumps(self.render_dictionary()),
-            content_type='application/json'
+            payload=ph_base._dumps(self.render_dictionary(artifacts=embedded_artifacts)),
+            content_type='application/json',
+            retry=bool(self.source_data_identifier)
         )
 
+        container_results = self._process_save_response(response)
+
+        if any(isinstance(artifact, ph_artifact) for artifact in self.artifacts):
+            container_results['artifacts'] = self._save_artifact_objects(
+                response,
+                container_results['created'],
+                embedded_artifacts,
+                remaining_artifacts,
+                artifact_batch_size,
+                index
+            )
+
+        if index is not None:
+            index.add_container(self.source_data_identifier, self.id)
+            for artifact in self.artifacts:
+                if isinstance(artifact, ph_artifact):
+                    index.add_artifact(artifact.container_id, artifact.source_data_identifier, artifact.id)
+
+        return container_results
+
+    def _save_known_container(self, container_id, artifact_batch_size, index):
+        """Sets the id of a container found in ``index`` and saves its artifacts that aren't in it. See ``save()``."""
+
+        self.id = container_id
+        container_results = {
+            'id': container_id,
+            'created': False
+        }
+
+        artifact_objects = [artifact for artifact in self.artifacts if isinstance(artifact, ph_artifact)]
+        if artifact_objects:
+            for artifact in artifact_objects:
+                artifact.container_id = container_id
+            container_results['artifacts'] = ph_artifact.save_many(artifact_objects, artifact_batch_size, index=index)
+
+        return container_results
+
+    def _split_artifacts(self, artifact_embed_limit):
+        """Splits ``artifacts`` into those sent in the container request and the ``ph_artifact`` objects
+        saved after it. See ``save()``."""
+
+        embedded_artifacts = []
+        remaining_artifacts = []
+        for artifact in self.artifacts:
+            if isinstance(artifact, ph_artifact) and len(embedded_artifacts) >= artifact_embed_limit:
+                remaining_artifacts.append(artifact)
+            else:
+                embedded_artifacts.append(artifact)
+
+        return embedded_artifacts, remaining_artifacts
+
+    def _save_artifact_objects(self, response, created, embedded_artifacts, remaining_artifacts, batch_size, index=None):
+        """Sets ids on the ``ph_artifact`` objects of a saved container, saving those that weren't embedded.
+
+        Returns:
+            list: ``ph_artifact.save_many()`` style results, in ``self.artifacts`` order.
+        """
+
+        embedded_ids = self._embedded_artifact_ids(response, embedded_artifacts) if created else None
+        results, unsaved_artifacts = self._set_embedded_artifact_ids(embedded_artifacts, remaining_artifacts, embedded_ids)
+
+        unsaved_results = ph_artifact.save_many(unsaved_artifacts, batch_size, index=index)
+        for artifact, artifact_result in zip(unsaved_artifacts, unsaved_results):
+            results[id(artifact)] = artifact_result
+
+        return self._ordered_artifact_results(results)
+
+    def _set_embedded_artifact_ids(self, embedded_artifacts, remaining_artifacts, embedded_ids):
+        """Sets the container id of the ``ph_artifact`` objects, and the ids of the embedded ones.
+
+        Returns:
+            tuple: ``(results, unsaved_artifacts)`` - results of the embedded objects keyed by ``id(artifact)``,
+            and the objects still to be saved with ``save_many()``.
+        """
+
+        embedded_objects = [artifact for artifact in embedded_artifacts if isinstance(artifact, ph_artifact)]
+        for artifact in embedded_objects + remaining_artifacts:
+            artifact.container_id = self.id
+
+        results = {}
+        if embedded_ids is None:
+            # existing container, or the new ids couldn't be matched up - let phantom de-duplicate them
+            return results, embedded_objects + remaining_artifacts
+
+        for artifact, artifact_id in zip(embedded_artifacts, embedded_ids):
+            if isinstance(artifact, ph_artifact):
+                artifact.id = artifact_id
+                results[id(artifact)] = {'id': artifact_id, 'created': True}
+
+        return results, remaining_artifacts
+
+    def _ordered_artifact_results(self, results):
+        """Results keyed by ``id(artifact)`` as a list in ``self.artifacts`` order."""
+
+        return [results[id(artifact)] for artifact in self.artifacts if isinstance(artifact, ph_artifact)]
+
+    def _embedded_artifact_ids(self, response, embedded_artifacts):
+        """Ids of the artifacts created with this container, in ``embedded_artifacts`` order - None if unknown."""
+
+        embedded_ids = self._response_artifact_ids(response, embedded_artifacts)
+        if embedded_ids is not None:
+            return embedded_ids
+
+        # phantom creates embedded artifacts in list order, so ascending ids line up with embedded_artifacts
+        artifacts_page = ph_base.query(use_cache=False, **self._embedded_artifacts_query(embedded_artifacts))
+
+        return self._page_artifact_ids(artifacts_page, embedded_artifacts)
+
+    @staticmethod
+    def _response_artifact_ids(response, embedded_artifacts):
+        """Embedded artifact ids from the container POST response - None if it doesn't list them."""
+
+        if not any(isinstance(artifact, ph_artifact) for artifact in embedded_artifacts):
+            return []
+
+        response_artifacts = response.get(ph_consts.CONTAINER_ARTIFACTS_KEY)
+        if type(response_artifacts) is list and len(response_artifacts) == len(embedded_artifacts):
+            return [
+                artifact.get(ph_consts.ARTIFACT_NEW_ID) if type(artifact) is dict else artifact
+                for artifact in response_artifacts
+            ]
+
+        return None
+
+    def _embedded_artifacts_query(self, embedded_artifacts):
+        """``query()`` arguments reading the first artifacts of this container, in creation order."""
+
+        return {
+            'query_type': 'artifact',
+            'order': 'asc',
+            'filters': [{'field': 'container_id', 'type': 'exact', 'value': self.id}],
+            'sort': 'id',
+            'page_size': len(embedded_artifacts),
+            'pretty': False
+        }
+
+    @staticmethod
+    def _page_artifact_ids(artifacts_page, embedded_artifacts):
+        """Embedded artifact ids from the ``_embedded_artifacts_query()`` response - None if they don't line up."""
+
+        if type(artifacts_page) is not dict or len(artifacts_page.get('data', [])) != len(embedded_artifacts):
+            return None
+
+        return [artifact[ph_consts.ARTIFACT_NEW_ID] for artifact in artifacts_page['data']]
+
+    def _process_save_response(self, response):
+        """Sets the container id from a container POST response. See ``save()``."""
+
         if response.get(ph_consts.CONTAINER_FAILED_KEY) and ph_consts.CONTAINER_DUPLICATE_MESSAGE not in response[ph_consts.CONTAINER_FAILED_MESSAGE_KEY]:
             raise Exception(str(response)) #response[ph_consts.CONTAINER_FAILED_MESSAGE_KEY])
 
@@ -129,8 +364,11 @@ class ph_container(object):
 
         return container_results
 
-    def render_dictionary(self):
+    def render_dictionary(self, artifacts=None):
         """Returns a dictionary representation of the object which could easily be converted to json with ``json.loads``
+
+        Keyword Args:
+            artifacts (list): artifacts to include instead of ``self.artifacts``.
         
         Returns:
             dict: Returns a dictionary representation of object.
@@ -139,7 +377,10 @@ class ph_container(object):
         container_json = {
             'label': self.label,
             'name': self.name,
-            'artifacts': self.artifacts,
+            'artifacts': [
+                self._render_artifact(artifact)
+                for artifact in (self.artifacts if artifacts is None else artifacts)
+            ],
             'custom_fields': self.custom_fields,
             'data': self.data,
             'description': self.description,
@@ -147,34 +388,21 @@ class ph_container(object):
             'tags': self.tags
         }
 
-        if self.asset_id:
-            container_json['asset_id'] = self.asset_id
-        if self.close_time:
-            container_json['close_time'] = self.close_time
-        if self.due_time:
-            container_json['due_time'] = self.due_time
-        if self.end_time:
-            container_json['end_time'] = self.end_time
-        if self.ingest_app_id:
-            container_json['ingest_app_id'] = self.ingest_app_id
-        if self.kill_chain and ph_base._exists_in_data_set('kill chain', ph_consts.KILL_CHAIN_LIST, self.kill_chain):
-            container_json['kill_chain'] = self.kill_chain
-        if self.owner_id:
-            container_json['owner_id'] = self.owner_id
-        if self.severity and ph_base._exists_in_data_set('severity', ph_consts.ARTIFACT_SEVERITY, self.severity):
-            container_json['severity'] = self.severity
-        if self.sensitivity and ph_base._exists_in_data_set('sensitivity', ph_consts.CONTAINER_SENSITIVITY, self.sensitivity):
-            container_json['sensitivity'] = self.sensitivity
-        if self.source_data_identifier:
-            container_json['source_data_identifier'] = self.source_data_identifier
-        if self.start_time:
-            container_json['start_time'] = self.start_time
-        if self.open_time:
-            container_json['open_time'] = self.open_time
-        if self.status and ph_base._exists_in_data_set('status', ph_consts.CONTAINER_STATUS, self.status):
-            container_json['status'] = self.status
+        _render_optional_fields(self, container_json)
         
         return container_json
+
+    @staticmethod
+    def _render_artifact(artifact):
+        """Artifacts may be dictionaries or ``ph_artifact`` objects - the container id is set by phantom."""
+
+        if not isinstance(artifact, ph_artifact):
+            return artifact
+
+        artifact_json = artifact.render_dictionary()
+        artifact_json.pop('container_id', None)
+
+        return artifact_json
     
     @classmethod
     def add_container_comment(cls, container_id, comment):
@@ -204,7 +432,7 @@ class ph_container(object):
         response = ph_base._send_request(
             '/rest/container_comment',
             'POST',
-            payload=json.dumps(container_json),
+            payload=ph_base._dumps(container_json),
             content_type = 'application/json'
         )
 
@@ -269,7 +497,7 @@ class ph_container(object):
         response = ph_base._send_request(
             '/rest/container_note',
             'post',
-            payload=json.dumps(container_json),
+            payload=ph_base._dumps(container_json),
             content_type = 'application/json'
         )
 
@@ -335,15 +563,15 @@ class ph_container(object):
 
         if playbook_id:
             pin_json['playbook_id'] = playbook_id
-        if pin_type and ph_base._exists_in_data_set('pin type', ph_consts.CONTAINER_PIN_TYPE, pin_type):
+        if pin_type and ph_base._validate_choice('pin type', ph_consts.CONTAINER_PIN_TYPE_VALUES, pin_type):
             pin_json['pin_type'] = pin_type
-        if pin_style and ph_base._exists_in_data_set('pin style', ph_consts.CONTAINER_PIN_STYLE, pin_style):
+        if pin_style and ph_base._validate_choice('pin style', ph_consts.CONTAINER_PIN_STYLE_VALUES, pin_style):
             pin_json['pin_style'] = pin_style
 
         response = ph_base._send_request(
             '/rest/container_pin',
             'post',
-            payload=json.dumps(pin_json),
+            payload=ph_base._dumps(pin_json),
             content_type='application/json'
         )
 
@@ -377,6 +605,88 @@ class ph_container(object):
         
         return ph_container.pin_to_container_hud(self.id, message, pin_data, playbook_id=playbook_id, pin_type=pin_type, pin_style=pin_style)
 
+    @classmethod
+    def add_container_comments(cls, comments, max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY):
+        """Adds many comments, to one or many containers, with up to ``max_concurrency`` requests in flight.
+
+        Args:
+            comments (list): dictionaries of ``add_container_comment()`` arguments -
+                ``{'container_id': id, 'comment': comment}``
+
+        Keyword Args:
+            max_concurrency (int): maximum number of requests in flight at once. Defaults to 8.
+
+        Returns:
+            list: one result per comment, in order. ``{'id': id_number, 'created': True}`` as returned by
+            ``add_container_comment()``, or ``{'id': None, 'created': False, 'failed': True, 'message': details}``
+            if that comment could not be added. A failure doesn't stop the other comments.
+
+        Example:
+            Comment on every container of a campaign::
+
+                results = ph_container.add_container_comments(
+                    [{'container_id': container_id, 'comment': 'part of campaign 12'} for container_id in campaign_ids]
+                )
+        """
+
+        return ph_base._map_concurrently(
+            lambda comment: cls.add_container_comment(**comment),
+            comments,
+            max_concurrency=max_concurrency
+        )
+
+    @classmethod
+    def add_container_notes(cls, notes, max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY):
+        """Adds many notes, to one or many containers, with up to ``max_concurrency`` requests in flight.
+
+        Args:
+            notes (list): dictionaries of ``add_container_note()`` arguments -
+                ``{'container_id': id, 'note_title': title, 'note_content': content, 'phase_id': phase_id}``
+                (``phase_id`` is optional).
+
+        Keyword Args:
+            max_concurrency (int): maximum number of requests in flight at once. Defaults to 8.
+
+        Returns:
+            list: one result per note, in order - see ``add_container_comments()``.
+        """
+
+        return ph_base._map_concurrently(
+            lambda note: cls.add_container_note(**note),
+            notes,
+            max_concurrency=max_concurrency
+        )
+
+    @classmethod
+    def add_container_pins(cls, pins, max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY):
+        """Pins many items to container HUDs, with up to ``max_concurrency`` requests in flight.
+
+        Args:
+            pins (list): dictionaries of ``pin_to_container_hud()`` arguments -
+                ``{'container_id': id, 'message': message, 'pin_data': data}`` plus optionally
+                ``playbook_id``, ``pin_type`` and ``pin_style``.
+
+        Keyword Args:
+            max_concurrency (int): maximum number of requests in flight at once. Defaults to 8.
+
+        Returns:
+            list: one result per pin, in order - see ``add_container_comments()``.
+
+        Example:
+            Pin enrichment results to the HUD of a container::
+
+                ph_container.add_container_pins([
+                    {'container_id': 1052, 'message': 'vt score', 'pin_data': '12/70', 'pin_type': 'card_small'},
+                    {'container_id': 1052, 'message': 'geo', 'pin_data': 'NL', 'pin_type': 'card_small'}
+                ])
+        """
+
+        return ph_base._map_concurrently(
+            lambda pin: cls.pin_to_container_hud(**pin),
+            pins,
+            max_concurrency=max_concurrency
+        )
+
     @classmethod
     def _format_container_results(cls, response, field_name, container_id):
         if ph_consts.CONTAINER_SUCCESS_KEY not in response or response[ph_consts.CONTAINER_SUCCESS_KEY] == False:
@@ -459,6 +769,41 @@ class ph_artifact(object):
         id (int): id of artifact set after ``save()`` is called.
 
     """
+
+    __slots__ = (
+        'cef',
+        'id',
+        'container_id',
+        'label',
+        'cef_types',
+        'description',
+        'data',
+        'end_time',
+        'ingest_app_id',
+        'kill_chain',
+        'name',
+        'owner_id',
+        'run_automation',
+        'severity',
+        'source_data_identifier',
+        'start_time',
+        'tags',
+        'artifact_type'
+    )
+
+    _optional_fields = (
+        'severity',
+        'cef_types',
+        'data',
+        'ingest_app_id',
+        'kill_chain',
+        'owner_id'
+    )
+    _choice_fields = (
+        ('severity', 'Artifact Severity', ph_consts.ARTIFACT_SEVERITY_VALUES),
+        ('kill_chain', 'Kill Chain Value', ph_consts.KILL_CHAIN_VALUES)
+    )
+
     def __init__(
         self,
         cef,
@@ -488,14 +833,14 @@ class ph_artifact(object):
         self.data = data
         self.end_time = end_time
         self.ingest_app_id = ingest_app_id
-        if(kill_chain and ph_base._exists_in_data_set('kill chain', ph_consts.KILL_CHAIN_LIST, kill_chain)):
+        if(kill_chain and ph_base._validate_choice('kill chain', ph_consts.KILL_CHAIN_VALUES, kill_chain)):
             self.kill_chain = kill_chain
         else:
             self.kill_chain = None
         self.name = name
         self.owner_id = owner_id
         self.run_automation = run_automation
-        if(severity and ph_base._exists_in_data_set('severity', ph_consts.ARTIFACT_SEVERITY, severity)):
+        if(severity and ph_base._validate_choice('severity', ph_consts.ARTIFACT_SEVERITY_VALUES, severity)):
             self.severity = severity
         else:
             self.severity = None
@@ -524,25 +869,18 @@ class ph_artifact(object):
             'descriptoin': self.description
         }
 
-        if self.severity and ph_base._exists_in_data_set('Artifact Severity', ph_consts.ARTIFACT_SEVERITY, self.severity):
-            artifact_json['severity'] = self.severity
-        if self.cef_types:
-            artifact_json['cef_types'] = self.cef_types
-        if self.data:
-            artifact_json['data'] = self.data
-        if self.ingest_app_id:
-            artifact_json['ingest_app_id'] = self.ingest_app_id
-        if self.kill_chain and ph_base._exists_in_data_set('Kill Chain Value', ph_consts.KILL_CHAIN_LIST, self.kill_chain):
-            artifact_json['kill_chain'] = self.kill_chain
-        if self.owner_id:
-            artifact_json['owner_id'] = self.owner_id
+        _render_optional_fields(self, artifact_json)
 
         return artifact_json
     
-    def save(self):
+    def save(self, index=None):
         """Saves artifact. 
 
         Sets the arifacts id. Sets the ``id`` attribute of the artifact to the new artifact id returned from phantom.
+
+        Keyword Args:
+            index (ph_sdi_index): if the index knows the artifact's ``container_id`` and
+                ``source_data_identifier``, the artifact is not posted. Saved artifacts are added to the index.
         
         Raises:
             Exception: Raises exception if artifact fails to save.
@@ -550,15 +888,45 @@ class ph_artifact(object):
         Returns:
             dict: Returns a dict indicating if the artifact was saved and the new id. ``{'id': id_number, 'created', True_or_False}``
         """
+
+        if index is not None:
+            known_result = self._known_artifact_result(index)
+            if known_result is not None:
+                return known_result
+
         response = ph_base._send_request(
             '/rest/artifact',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
-        if response.get(ph_consts.ARTIFACT_FAILED_KEY) and response[ph_consts.ARTIFACT_FAILED_MESSAGE_KEY] != ph_consts.ARTIFACT_EXISTING_ID:
-            raise Exception(response[ph_consts.ARTIFACT_FAILED_MESSAGE_KEY])
+        artifact_results = self._process_save_response(response)
+
+        if index is not None:
+            index.add_artifact(self.container_id, self.source_data_identifier, self.id)
+
+        return artifact_results
+
+    def _known_artifact_result(self, index):
+        """Sets the id of an artifact found in ``index`` - returns its ``save()`` result, or None if unknown."""
+
+        existing_id = index.artifact_id(self.container_id, self.source_data_identifier)
+        if not existing_id:
+            return None
+
+        self.id = existing_id
+
+        return {
+            'id': existing_id,
+            'created': False
+        }
+
+    def _process_save_response(self, response):
+        """Sets the artifact id from an artifact POST response. See ``save()``."""
+
+        if response.get(ph_consts.ARTIFACT_FAILED_KEY) and ph_consts.ARTIFACT_DUPLICATE_MESSAGE not in response.get(ph_consts.ARTIFACT_FAILED_MESSAGE_KEY, ''):
+            raise Exception(response.get(ph_consts.ARTIFACT_FAILED_MESSAGE_KEY, str(response)))
 
         self.id = response[ph_consts.ARTIFACT_NEW_ID] if response.get(ph_consts.ARTIFACT_NEW_ID) else response[ph_consts.ARTIFACT_EXISTING_ID]
 
@@ -569,6 +937,92 @@ class ph_artifact(object):
 
         return artifact_results
 
+    @classmethod
+    def save_many(cls, artifacts, batch_size=ph_consts.ARTIFACT_BATCH_SIZE, index=None, journal=None):
+        """Saves many artifacts with one POST per ``batch_size`` artifacts instead of one per artifact.
+
+        Sets the ``id`` attribute of each artifact that was saved (or already existed). A failure only
+        affects the artifacts it concerns - the rest of the batch, and later batches, are still saved.
+
+        Args:
+            artifacts (list): list of ``ph_artifact`` objects. They may belong to different containers.
+
+        Keyword Args:
+            batch_size (int): number of artifacts sent per request. Defaults to 100.
+            index (ph_sdi_index): artifacts known to the index are not posted - see ``save()``.
+            journal (ph_journal): artifacts saved by an earlier call with the same journal are restored
+                from it instead of being posted (their result has ``journaled`` set). Saved artifacts
+                are recorded in it.
+
+        Returns:
+            list: one dict per artifact, in input order. ``{'id': id_number, 'created': True_or_False}``
+            as returned by ``save()`` (``created`` is False for duplicates, with ``id`` set to the
+            existing artifact), or ``{'id': None, 'created': False, 'failed': True, 'message': details}``.
+
+        Example:
+            Save all artifacts of a container in a couple of requests::
+
+                artifacts = [ph_artifact({'sourceAddress': ip}, container.id, 'event') for ip in ips]
+                results = ph_artifact.save_many(artifacts)
+                failed = [result for result in results if result.get('failed')]
+        """
+
+        artifacts = list(artifacts)
+        results = [None] * len(artifacts)
+
+        unsaved = []
+        for position, artifact in enumerate(artifacts):
+            if journal is not None:
+                results[position] = journal.restore(artifact)
+            if index is not None and results[position] is None:
+                results[position] = artifact._known_artifact_result(index)
+            if results[position] is None:
+                unsaved.append(position)
+                if journal is not None:
+                    journal.begin(artifact)
+
+        for batch_start in range(0, len(unsaved), batch_size):
+            batch_positions = unsaved[batch_start:batch_start + batch_size]
+            batch = [artifacts[position] for position in batch_positions]
+
+            try:
+                response = ph_base._send_request(
+                    '/rest/artifact',
+                    'post',
+                    payload=ph_base._dumps([artifact.render_dictionary() for artifact in batch]),
+                    content_type='application/json'
+                )
+            except Exception as err:
+                response = err
+
+            cls._process_batch_response(batch_positions, batch, response, results, index, journal)
+
+        return results
+
+    @classmethod
+    def _process_batch_response(cls, batch_positions, batch, response, results, index=None, journal=None):
+        """Fills ``results`` for one ``save_many()`` batch from phantom's response, or the exception raised
+        sending it."""
+
+        if not isinstance(response, Exception) and (type(response) is not list or len(response) != len(batch)):
+            response = Exception('Unexpected response to artifact batch. Details: ' + str(response))
+
+        if isinstance(response, Exception):
+            for position in batch_positions:
+                results[position] = ph_base._failed_result(response)
+            return
+
+        for position, artifact, artifact_response in zip(batch_positions, batch, response):
+            try:
+                results[position] = artifact._process_save_response(artifact_response)
+            except Exception as err:
+                results[position] = ph_base._failed_result(err)
+                continue
+            if index is not None:
+                index.add_artifact(artifact.container_id, artifact.source_data_identifier, artifact.id)
+            if journal is not None:
+                journal.complete(artifact, results[position])
+
     @classmethod
     def retrieve_artifact_json(cls, id=None):
         """Get artifact data from phantom.
@@ -604,4 +1058,18 @@ class ph_artifact(object):
             dict: results of delete
         """
         return ph_base._delete_record('artifact', id)
-    
\ No newline at end of file
+    
+
+def _render_optional_fields(record, record_json):
+    """Adds the ``_optional_fields`` of a container or artifact that are set to its dictionary
+    representation, checking the ``_choice_fields`` against their valid values."""
+
+    for field, data_set_name, valid_values in record._choice_fields:
+        value = getattr(record, field)
+        if value and value not in valid_values:
+            ph_base._validate_choice(data_set_name, valid_values, value)
+
+    for field in record._optional_fields:
+        value = getattr(record, field)
+        if value:
+            record_json[field] = value
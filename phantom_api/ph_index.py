@@ -0,0 +1,268 @@
+"""Client side index of ``source_data_identifier`` values, to skip saving records phantom already has.
+
+Phantom only reports a duplicate container or artifact after the whole record has been posted. With a
+``ph_sdi_index`` passed to ``ph_container.save()``, ``ph_artifact.save()``, ``ph_artifact.save_many()``
+or ``ph_ingest_pipeline``, records whose ``source_data_identifier`` is already known are resolved
+locally - their ``id`` is set from the index and nothing is sent to phantom.
+
+The index maps container ``source_data_identifier`` to container id and ``(container_id,
+source_data_identifier)`` to artifact id. It is filled by the saves that use it, warmed from phantom
+with ``warm()`` and can be kept between runs with ``save_snapshot()``.
+
+For very large histories a bloom filter can be used instead of the maps (``bloom_capacity``). It only
+stores whether an identifier was seen: an unknown identifier is still resolved without a request,
+while a known one costs a small query for its id instead of a full POST.
+
+Example:
+    Warm the index once, then keep it up to date on disk::
+
+        index = ph_sdi_index(path='/var/lib/ingest/sdi_index.json')
+        if not index.containers:
+            index.warm(filters=[{'field': 'label', 'type': 'exact', 'value': 'events'}])
+
+        for container in containers:
+            container.save(index=index)
+
+        index.save_snapshot()
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+from phantom_api import ph_base
+from phantom_api import ph_consts
+
+class ph_sdi_index(object):
+    """Maps ``source_data_identifier`` values to the ids of existing containers and artifacts.
+
+    Keyword Args:
+        path (string): snapshot file. Loaded if it exists, and written by ``save_snapshot()``.
+        bloom_capacity (int): keep a bloom filter sized for this many identifiers instead of the
+            id maps. Ignored if ``path`` holds a snapshot.
+        bloom_error_rate (float): false positive rate of the bloom filter. Defaults to 0.001.
+
+    Attributes:
+        containers (dict): container ``source_data_identifier`` -> container id.
+        artifacts (dict): ``(container_id, source_data_identifier)`` -> artifact id.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        bloom_capacity=None,
+        bloom_error_rate=ph_consts.INDEX_BLOOM_ERROR_RATE
+    ):
+        self.path = path
+        self.containers = {}
+        self.artifacts = {}
+        self.bloom = _bloom_filter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load_snapshot(path)
+
+    def container_id(self, source_data_identifier):
+        """Returns the id of the container with this ``source_data_identifier``, or None if unknown."""
+
+        if not source_data_identifier:
+            return None
+
+        if self.bloom is None:
+            return self.containers.get(source_data_identifier)
+
+        if _container_key(source_data_identifier) not in self.bloom:
+            return None
+
+        return self._lookup_id(
+            'container',
+            [{'field': 'source_data_identifier', 'type': 'exact', 'value': source_data_identifier}]
+        )
+
+    def artifact_id(self, container_id, source_data_identifier):
+        """Returns the id of the artifact of ``container_id`` with this ``source_data_identifier``, or None if unknown."""
+
+        if not container_id or not source_data_identifier:
+            return None
+
+        if self.bloom is None:
+            return self.artifacts.get((container_id, source_data_identifier))
+
+        if _artifact_key(container_id, source_data_identifier) not in self.bloom:
+            return None
+
+        return self._lookup_id(
+            'artifact',
+            [
+                {'field': 'container_id', 'type': 'exact', 'value': container_id},
+                {'field': 'source_data_identifier', 'type': 'exact', 'value': source_data_identifier}
+            ]
+        )
+
+    def add_container(self, source_data_identifier, container_id):
+        """Records a container. Identifiers that are empty are ignored."""
+
+        if not source_data_identifier or not container_id:
+            return
+
+        with self._lock:
+            if self.bloom is None:
+                self.containers[source_data_identifier] = container_id
+            else:
+                self.bloom.add(_container_key(source_data_identifier))
+
+    def add_artifact(self, container_id, source_data_identifier, artifact_id):
+        """Records an artifact. Identifiers that are empty are ignored."""
+
+        if not container_id or not source_data_identifier or not artifact_id:
+            return
+
+        with self._lock:
+            if self.bloom is None:
+                self.artifacts[(container_id, source_data_identifier)] = artifact_id
+            else:
+                self.bloom.add(_artifact_key(container_id, source_data_identifier))
+
+    def warm(self, filters=[], artifacts=False, page_size=ph_consts.QUERY_DEFAULT_PAGE_SIZE, shards=4):
+        """Adds the containers (and optionally artifacts) that already exist in phantom.
+
+        Records are read with ``ph_base.scan()``, one page at a time.
+
+        Keyword Args:
+            filters (list): filters limiting the records read - see ``ph_base.query()``
+            artifacts (bool): also index artifacts. The same filters are applied to them.
+            page_size (int): number of records requested per page. Defaults to 1000.
+            shards (int): number of id ranges read in parallel. Defaults to 4.
+
+        Returns:
+            dict: number of records indexed. ``{'containers': n, 'artifacts': n}``
+        """
+
+        warmed = {'containers': 0, 'artifacts': 0}
+
+        for container in ph_base.scan('container', filters=filters, shards=shards, page_size=page_size, pretty=False):
+            if container.get('source_data_identifier'):
+                self.add_container(container['source_data_identifier'], container['id'])
+                warmed['containers'] += 1
+
+        if artifacts:
+            for artifact in ph_base.scan('artifact', filters=filters, shards=shards, page_size=page_size, pretty=False):
+                if artifact.get('source_data_identifier'):
+                    self.add_artifact(artifact['container_id'], artifact['source_data_identifier'], artifact['id'])
+                    warmed['artifacts'] += 1
+
+        return warmed
+
+    def save_snapshot(self, path=None):
+        """Writes the index to ``path`` (defaults to the path it was created with).
+
+        The file is replaced in one step, so an interrupted write leaves the previous snapshot intact.
+        """
+
+        path = path or self.path
+        if not path:
+            raise Exception('No snapshot path specified.')
+
+        with self._lock:
+            snapshot = {
+                'version': ph_consts.INDEX_SNAPSHOT_VERSION,
+                # pairs rather than an object, so identifiers that aren't strings survive the round trip
+                'containers': [
+                    [source_data_identifier, container_id]
+                    for source_data_identifier, container_id in self.containers.items()
+                ],
+                'artifacts': [
+                    [container_id, source_data_identifier, artifact_id]
+                    for (container_id, source_data_identifier), artifact_id in self.artifacts.items()
+                ],
+                'bloom': self.bloom.render_dictionary() if self.bloom is not None else None
+            }
+            snapshot_json = json.dumps(snapshot)
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as snapshot_file:
+            snapshot_file.write(snapshot_json)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.rename(temp_path, path)
+
+    def load_snapshot(self, path):
+        """Replaces the contents of the index with a snapshot written by ``save_snapshot()``."""
+
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+
+        if snapshot.get('version') not in ph_consts.INDEX_SNAPSHOT_VERSIONS:
+            raise Exception('Unsupported index snapshot version in ' + path + ' - ' + str(snapshot.get('version')))
+
+        with self._lock:
+            if isinstance(snapshot['containers'], dict):
+                self.containers = snapshot['containers']
+            else:
+                self.containers = dict(
+                    (source_data_identifier, container_id)
+                    for source_data_identifier, container_id in snapshot['containers']
+                )
+            self.artifacts = dict(
+                ((container_id, source_data_identifier), artifact_id)
+                for container_id, source_data_identifier, artifact_id in snapshot['artifacts']
+            )
+            self.bloom = _bloom_filter.from_dictionary(snapshot['bloom']) if snapshot.get('bloom') else None
+
+    @staticmethod
+    def _lookup_id(query_type, filters):
+        response = ph_base.query(query_type, filters=filters, page_size=1, pretty=False, use_cache=False)
+        if type(response) is dict and response.get('data'):
+            return response['data'][0]['id']
+
+        # bloom filter false positive
+        return None
+
+def _container_key(source_data_identifier):
+    return u'c\x00' + str(source_data_identifier)
+
+def _artifact_key(container_id, source_data_identifier):
+    return u'a\x00' + str(container_id) + u'\x00' + str(source_data_identifier)
+
+class _bloom_filter(object):
+    """Fixed size bloom filter over unicode strings (double hashing on an md5 digest)."""
+
+    def __init__(self, capacity, error_rate, bits=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / float(capacity) * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        first_hash, second_hash = struct.unpack('<QQ', hashlib.md5(key.encode('utf-8')).digest())
+        for hash_num in range(self.hash_count):
+            yield (first_hash + hash_num * second_hash) % self.size
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        for position in self._positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def render_dictionary(self):
+        return {
+            'capacity': self.capacity,
+            'error_rate': self.error_rate,
+            'bits': base64.b64encode(bytes(self.bits)).decode('ascii')
+        }
+
+    @classmethod
+    def from_dictionary(cls, bloom_json):
+        return cls(
+            bloom_json['capacity'],
+            bloom_json['error_rate'],
+            bits=bytearray(base64.b64decode(bloom_json['bits']))
+        )
@@ -0,0 +1,217 @@
+"""Concurrent ingestion of containers and artifacts.
+
+A producer thread reads ``ph_container`` and ``ph_artifact`` objects from any iterable (a generator
+reading a kafka topic, a file, another phantom...) into a bounded queue, and a pool of worker threads
+saves them. When phantom slows down the queue fills up and the producer stops reading from the source,
+so the pipeline never holds more than ``queue_size + workers`` items at once.
+
+Results are handed to the callback in the order the items were read, which makes it safe to
+acknowledge the source (e.g. commit kafka offsets) from the callback.
+
+Example:
+    Ingest events from a kafka consumer, committing offsets as they are saved::
+
+        def events():
+            for message in consumer:
+                event = json.loads(message.value)
+                yield ph_container(
+                    'events',
+                    event['name'],
+                    source_data_identifier=event['id'],
+                    artifacts=[ph_artifact(cef, None, 'event') for cef in event['artifacts']]
+                )
+
+        def saved(container, result):
+            if result.get('failed'):
+                log.error(result['message'])
+            consumer.commit()
+
+        summary = ph_ingest_pipeline(workers=16, callback=saved).run(events())
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from phantom_api import ph_base
+from phantom_api import ph_consts
+from phantom_api.ph_events import ph_artifact
+from phantom_api.ph_events import ph_container
+
+class ph_ingest_pipeline(object):
+    """Saves containers and artifacts from an iterable with a pool of worker threads.
+
+    Containers are saved with ``ph_container.save()`` (along with any artifacts they hold) and artifacts
+    with ``ph_artifact.save()``, so phantom's duplicate detection on ``source_data_identifier`` applies:
+    an item that already exists is reported as a duplicate and gets the id of the existing record.
+
+    Keyword Args:
+        workers (int): number of items saved concurrently. Defaults to 8.
+        queue_size (int): number of items read ahead of the workers. Defaults to 4 per worker.
+        callback (function): called as ``callback(item, result)`` for every item, in the order the
+            items were read. ``result`` is the dict returned by ``save()``, or
+            ``{'id': None, 'created': False, 'failed': True, 'message': details}`` if the save failed.
+        artifact_batch_size (int): batch size for artifacts saved after their container. Defaults to 100.
+        index (ph_sdi_index): resolve items whose ``source_data_identifier`` is already known without
+            posting them - see ``ph_container.save()``.
+        journal (ph_journal): skip items completed by an earlier run with the same journal (their ids
+            are restored from it), and record the items saved by this one.
+
+    Note:
+        The callback runs on the thread that called ``run()``. A slow callback slows the pipeline down
+        like a slow phantom would.
+    """
+
+    def __init__(
+        self,
+        workers=ph_consts.INGEST_DEFAULT_WORKERS,
+        queue_size=None,
+        callback=None,
+        artifact_batch_size=ph_consts.ARTIFACT_BATCH_SIZE,
+        index=None,
+        journal=None
+    ):
+        self.workers = workers
+        self.queue_size = queue_size or workers * ph_consts.INGEST_QUEUE_SIZE_PER_WORKER
+        self.callback = callback
+        self.artifact_batch_size = artifact_batch_size
+        self.index = index
+        self.journal = journal
+
+    def run(self, items):
+        """Saves every item and returns once all of them have been saved.
+
+        Args:
+            items (iterable): ``ph_container`` and/or ``ph_artifact`` objects. Read lazily.
+
+        Raises:
+            Exception: Raises the exception raised by ``items`` (once the items read before it have been
+                saved) or by the callback. Failed saves don't raise - they are passed to the callback.
+
+        Returns:
+            dict: summary of the run -
+            ``{'items': n, 'created': n, 'duplicate': n, 'failed': n, 'journaled': n, 'seconds': s, 'items_per_second': r}``
+            where ``journaled`` counts the items skipped because the journal had them.
+        """
+
+        summary = {
+            'items': 0,
+            'created': 0,
+            'duplicate': 0,
+            'failed': 0,
+            'journaled': 0
+        }
+
+        pending = queue.Queue(maxsize=self.queue_size)
+        # one token per item between the source and the callback, including saved items waiting on an earlier one
+        in_flight = queue.Queue(maxsize=self.queue_size + self.workers)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            read = 0
+            error = None
+            try:
+                for item in items:
+                    if not ph_base._put_unless_stopped(in_flight, None, stop):
+                        return
+                    if not ph_base._put_unless_stopped(pending, (read, item), stop):
+                        return
+                    read += 1
+            except Exception as err:
+                error = err
+            results.put(('done', read, error))
+            for _ in range(self.workers):
+                ph_base._put_unless_stopped(pending, None, stop)
+
+        def work():
+            while not stop.is_set():
+                try:
+                    entry = pending.get(timeout=ph_consts.QUEUE_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if entry is None:
+                    return
+                results.put(('saved', entry[0], (entry[1], self._save(entry[1]))))
+
+        start = time.time()
+        producer = threading.Thread(target=produce)
+        producer.daemon = True
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for _ in range(self.workers):
+                executor.submit(work)
+            producer.start()
+
+            saved = {}
+            next_item = 0
+            total = None
+            source_error = None
+            while total is None or next_item < total:
+                kind, position, value = results.get()
+                if kind == 'done':
+                    total, source_error = position, value
+                    continue
+
+                saved[position] = value
+                while next_item in saved:
+                    item, result = saved.pop(next_item)
+                    self._count(summary, result)
+                    if self.callback is not None:
+                        self.callback(item, result)
+                    in_flight.get()
+                    next_item += 1
+
+            if source_error is not None:
+                raise source_error
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+        summary['seconds'] = time.time() - start
+        summary['items_per_second'] = summary['items'] / summary['seconds'] if summary['seconds'] else 0.0
+
+        return summary
+
+    def _save(self, item):
+        """Saves one item, turning failures into a failed result."""
+
+        try:
+            if not isinstance(item, (ph_container, ph_artifact)):
+                raise Exception('Cannot ingest ' + type(item).__name__ + ' - expected ph_container or ph_artifact.')
+
+            if self.journal is not None:
+                journal_result = self.journal.restore(item)
+                if journal_result is not None:
+                    return journal_result
+                self.journal.begin(item)
+
+            if isinstance(item, ph_container):
+                result = item.save(artifact_batch_size=self.artifact_batch_size, index=self.index)
+            else:
+                result = item.save(index=self.index)
+        except Exception as err:
+            return ph_base._failed_result(err)
+
+        # a container whose artifacts partly failed stays unfinished, so a rerun retries them
+        if self.journal is not None and not any(
+            artifact_result.get(ph_consts.ARTIFACT_FAILED_KEY) for artifact_result in result.get('artifacts', [])
+        ):
+            self.journal.complete(item, result)
+
+        return result
+
+    @staticmethod
+    def _count(summary, result):
+        summary['items'] += 1
+        if result.get('journaled'):
+            summary['journaled'] += 1
+        elif result.get(ph_consts.ARTIFACT_FAILED_KEY):
+            summary['failed'] += 1
+        elif result.get('created'):
+            summary['created'] += 1
+        else:
+            summary['duplicate'] += 1
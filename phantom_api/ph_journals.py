@@ -0,0 +1,157 @@
+"""Crash safe record of bulk saves, so an interrupted ingestion job can resume where it stopped.
+
+A ``ph_journal`` is a small SQLite database. ``ph_ingest_pipeline`` and ``ph_artifact.save_many()`` record
+each container/artifact before posting it and store the result (ids included) once phantom has saved it.
+When the same items are fed to them again after a crash, the completed ones are restored from the
+journal - their ids are set, nothing is sent to phantom - and only the unfinished tail is saved.
+
+Items are identified by ``source_data_identifier`` when they have one (artifacts also by
+``container_id``), otherwise by a hash of their contents. The hash leaves out ``open_time``,
+``start_time`` and ``end_time`` when they were left at their defaults (the time the package was
+imported), so an item built the same way by the next run has the same key - items without a
+``source_data_identifier`` that only differ by those defaulted times are treated as one item.
+
+Example:
+    Resumable backfill::
+
+        journal = ph_journal('/var/lib/ingest/backfill.db')
+        summary = ph_ingest_pipeline(journal=journal).run(read_backfill())
+        print(summary['journaled'], 'containers were already saved by a previous run')
+        journal.close()
+"""
+
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from phantom_api import ph_consts
+from phantom_api.ph_events import ph_artifact
+from phantom_api.ph_events import ph_container
+
+class ph_journal(object):
+    """Append only journal of saved containers and artifacts, kept in a SQLite database.
+
+    Args:
+        path (string): database file. Created if it doesn't exist.
+
+    Note:
+        One journal may be shared by many threads, but not by several processes at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, kind TEXT NOT NULL, state TEXT NOT NULL, '
+            'record_id INTEGER, result TEXT, updated REAL NOT NULL)'
+        )
+
+    def close(self):
+        """Closes the database."""
+
+        with self._lock:
+            self._db.close()
+
+    def begin(self, item):
+        """Records that ``item`` is about to be saved. Does nothing if it was already completed."""
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR IGNORE INTO entries (key, kind, state, updated) VALUES (?, ?, ?, ?)',
+                (_item_key(item), _item_kind(item), ph_consts.JOURNAL_STATE_PENDING, time.time())
+            )
+
+    def complete(self, item, result):
+        """Records the result of a successful save of ``item``.
+
+        Args:
+            item (ph_container or ph_artifact): saved item.
+            result (dict): what its ``save()`` returned.
+        """
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, kind, state, record_id, result, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    _item_key(item),
+                    _item_kind(item),
+                    ph_consts.JOURNAL_STATE_DONE,
+                    result.get('id'),
+                    json.dumps(result),
+                    time.time()
+                )
+            )
+
+    def restore(self, item):
+        """Sets the ids of an item completed by a previous run.
+
+        Returns:
+            dict: the ``save()`` result that was recorded, with ``journaled`` set to True - or None if
+            the item was never completed.
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT result FROM entries WHERE key = ? AND state = ?',
+                (_item_key(item), ph_consts.JOURNAL_STATE_DONE)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        result = json.loads(row[0])
+        item.id = result['id']
+        for artifact, artifact_result in zip(_artifact_objects(item), result.get('artifacts', [])):
+            artifact.container_id = item.id
+            artifact.id = artifact_result.get('id')
+        result['journaled'] = True
+
+        return result
+
+    def counts(self):
+        """Returns the number of entries per state. ``{'pending': n, 'done': n}``"""
+
+        counts = {ph_consts.JOURNAL_STATE_PENDING: 0, ph_consts.JOURNAL_STATE_DONE: 0}
+        with self._lock:
+            for state, count in self._db.execute('SELECT state, COUNT(*) FROM entries GROUP BY state'):
+                counts[state] = count
+
+        return counts
+
+def _item_kind(item):
+    return 'container' if isinstance(item, ph_container) else 'artifact'
+
+def _item_key(item):
+    if _item_kind(item) == 'artifact' and item.source_data_identifier and item.container_id:
+        return 'artifact:' + str(item.container_id) + ':' + str(item.source_data_identifier)
+    if _item_kind(item) == 'container' and item.source_data_identifier:
+        return 'container:' + str(item.source_data_identifier)
+
+    # no identifier - the contents are the identity. Embedded artifacts render without ids.
+    item_json = item.render_dictionary()
+    _drop_default_times(item_json, item.__class__)
+    for artifact_json in item_json.get(ph_consts.CONTAINER_ARTIFACTS_KEY, []) if _item_kind(item) == 'container' else []:
+        _drop_default_times(artifact_json, ph_artifact)
+
+    content = json.dumps(item_json, sort_keys=True, default=str)
+    return _item_kind(item) + '#' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def _drop_default_times(item_json, item_class):
+    """Removes the time fields still holding ``item_class``'s import time defaults."""
+
+    parameters = inspect.signature(item_class.__init__).parameters
+    for field in ph_consts.JOURNAL_DEFAULT_TIME_FIELDS:
+        if field in parameters and parameters[field].default is not None and item_json.get(field) == parameters[field].default:
+            del item_json[field]
+
+def _artifact_objects(item):
+    if not isinstance(item, ph_container):
+        return []
+
+    return [artifact for artifact in item.artifacts if isinstance(artifact, ph_artifact)]
@@ -1,4 +1,3 @@
-import json
 from phantom_api import ph_base
 from phantom_api import ph_consts
 
@@ -58,7 +57,7 @@ class ph_list(object):
                 response = ph_base._send_request(
                     '/rest/decided_list/' + self.name,
                     'post',
-                    payload=json.dumps(self.format_list_json()),
+                    payload=ph_base._dumps(self.format_list_json()),
                     content_type='application/json'
                 )
             else:
@@ -66,7 +65,7 @@ class ph_list(object):
                     response = ph_base._send_request(
                         '/rest/decided_list',
                         'post',
-                        payload=json.dumps(self.format_list_json()),
+                        payload=ph_base._dumps(self.format_list_json()),
                         content_type='application/json'
                     )
 
@@ -137,7 +136,7 @@ class ph_list(object):
 
         response = ph_base._send_request(
             '/rest/decided_list/' + self.name,
-            'POST', payload=json.dumps(update_json),
+            'POST', payload=ph_base._dumps(update_json),
             content_type='application/json'
         )
 
@@ -0,0 +1,396 @@
+"""Background tracking of running actions and playbooks, with adaptive polling.
+
+A ``ph_run_scheduler`` polls every run it tracks from one background thread and resolves a
+``concurrent.futures.Future`` for each run when it finishes. Runs that are due at about the same
+time are polled together, with one ``_filter_id__in`` query per run type (and per 100 ids).
+
+Each run's poll interval adapts to how long runs like it usually take (an exponentially weighted
+average of the completion times seen so far, per action name or playbook id): polls are sparse while
+a run is young, frequent around the time it is expected to finish, and back off again once it has
+run longer than usual.
+
+Example:
+    Run actions and react to each as it completes, without a polling loop::
+
+        scheduler = ph_scheduler.default_scheduler()
+        for action in actions:
+            action.run()
+            scheduler.track_action(action.action_id, key=action.action).add_done_callback(
+                lambda future: print(future.result()['status'])
+            )
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+try:
+    from concurrent.futures import InvalidStateError
+except ImportError:
+    InvalidStateError = RuntimeError
+from phantom_api import ph_base
+from phantom_api import ph_consts
+
+_default_scheduler = {
+    'scheduler': None
+}
+
+_default_scheduler_lock = threading.Lock()
+
+def default_scheduler():
+    """Returns the scheduler shared by the package, creating it on first use."""
+
+    with _default_scheduler_lock:
+        if _default_scheduler['scheduler'] is None or _default_scheduler['scheduler'].closed:
+            _default_scheduler['scheduler'] = ph_run_scheduler()
+
+        return _default_scheduler['scheduler']
+
+class ph_run_scheduler(object):
+    """Tracks action and playbook runs until they finish.
+
+    Keyword Args:
+        min_interval (float): shortest time between two polls of a run, in seconds. Defaults to 0.5.
+        max_interval (float): longest time between two polls of a run, in seconds. Defaults to 30.
+        expected_duration (float): completion time assumed for runs of a kind not seen finishing yet,
+            in seconds. Defaults to 10. Until then polls start at ``min_interval`` and double as the run ages.
+
+    Attributes:
+        closed (bool): True once ``close()`` has been called.
+    """
+
+    def __init__(
+        self,
+        min_interval=ph_consts.SCHEDULER_MIN_INTERVAL,
+        max_interval=ph_consts.SCHEDULER_MAX_INTERVAL,
+        expected_duration=ph_consts.SCHEDULER_EXPECTED_DURATION
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.expected_duration = expected_duration
+        self.closed = False
+        # heap of (next poll time, sequence, run)
+        self._queue = []
+        self._sequence = itertools.count()
+        # (run_type, key) -> average completion time
+        self._durations = {}
+        self._lock = threading.Condition(threading.Lock())
+        self._thread = None
+
+    def track_action(self, action_id, key=None, callback=None):
+        """Starts tracking a running action.
+
+        Args:
+            action_id (int): id of the running action.
+
+        Keyword Args:
+            key (string): kind of action (e.g. the action name) whose completion times predict this one's.
+            callback (function): called with the future once the action finishes.
+
+        Returns:
+            concurrent.futures.Future: resolves to the ``action_run`` record once its status is success,
+            failed or cancelled. Cancelling the future only stops tracking - see ``ph_action.cancel()``.
+        """
+
+        return self._track('action_run', action_id, key, callback)
+
+    def track_playbook(self, playbook_run_id, key=None, callback=None):
+        """Starts tracking a running playbook.
+
+        Args:
+            playbook_run_id (int): id of the playbook run.
+
+        Keyword Args:
+            key (string): kind of playbook (e.g. the playbook id) whose completion times predict this one's.
+            callback (function): called with the future once the playbook finishes.
+
+        Returns:
+            concurrent.futures.Future: resolves to the ``playbook_run`` record once it finishes.
+        """
+
+        return self._track('playbook_run', playbook_run_id, key, callback)
+
+    def outstanding(self):
+        """Returns the number of runs being tracked."""
+
+        with self._lock:
+            return len(self._queue)
+
+    def close(self):
+        """Stops the background thread. Futures of runs still being tracked are cancelled.
+
+        Runs being polled when ``close()`` is called are resolved by that poll if it finds them
+        finished, and cancelled otherwise.
+        """
+
+        with self._lock:
+            self.closed = True
+            queued = self._queue
+            self._queue = []
+            self._lock.notify()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        for _, _, run in queued:
+            _resolve(run['future'])
+
+    def _track(self, run_type, run_id, key, callback):
+        if run_id is None:
+            raise Exception('No ' + run_type + ' id was specified.')
+
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        now = time.time()
+        run = {
+            'type': run_type,
+            'id': run_id,
+            'key': (run_type, key),
+            'started': now,
+            'future': future
+        }
+
+        with self._lock:
+            if self.closed:
+                raise Exception('Run scheduler is closed.')
+            self._schedule(run, now)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._lock.notify()
+
+        return future
+
+    def _expected(self, key):
+        """Returns the expected completion time of runs of ``key``, and whether any was seen finishing."""
+
+        for known_key in (key, (key[0], None)):
+            if known_key in self._durations:
+                return self._durations[known_key], True
+
+        return self.expected_duration, False
+
+    def _interval(self, run, now):
+        """Seconds until the next poll of ``run``."""
+
+        age = now - run['started']
+        expected, known = self._expected(run['key'])
+        remaining = expected - age
+        if remaining > 0:
+            # close in on the expected completion time - doubling from min_interval while it is only a guess
+            interval = remaining / 2.0 if known else min(remaining / 2.0, age)
+        else:
+            # running longer than usual - back off as it ages
+            interval = -remaining * ph_consts.SCHEDULER_BACKOFF_FACTOR
+
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _schedule(self, run, now):
+        """Queues the next poll of ``run``. Called with ``_lock`` held."""
+
+        heapq.heappush(self._queue, (now + self._interval(run, now), next(self._sequence), run))
+
+    def _record_duration(self, run, now):
+        """Updates the average completion time of runs like ``run``. Called with ``_lock`` held."""
+
+        duration = now - run['started']
+        for key in (run['key'], (run['type'], None)):
+            if key in self._durations:
+                self._durations[key] += ph_consts.SCHEDULER_DURATION_WEIGHT * (duration - self._durations[key])
+            else:
+                self._durations[key] = duration
+
+    def _take_due(self):
+        """Removes the runs that are due - or will be within ``min_interval``, so they share the
+        poll. Called with ``_lock`` held."""
+
+        horizon = time.time() + self.min_interval
+        due = []
+        while self._queue and self._queue[0][0] <= horizon:
+            due.append(heapq.heappop(self._queue)[2])
+
+        return due
+
+    def _run(self):
+        """Background thread - polls the runs as they become due."""
+
+        while True:
+            with self._lock:
+                while not self.closed and (not self._queue or self._queue[0][0] > time.time()):
+                    self._lock.wait(self._queue[0][0] - time.time() if self._queue else None)
+                if self.closed:
+                    return
+                # futures cancelled by their caller are dropped here
+                due = [run for run in self._take_due() if not run['future'].done()]
+
+            try:
+                self._poll_due(due)
+            except Exception as err:
+                # never let one bad poll end the tracking of every run in the process
+                for run in due:
+                    _resolve(run['future'], error=err)
+
+    def _poll_due(self, due):
+        """Polls ``due``, resolves the runs that finished (or failed to be polled) and reschedules the others."""
+
+        outcomes = {}
+        for run_type in ph_consts.RUN_TERMINAL_STATUSES:
+            ids = sorted(set(run['id'] for run in due if run['type'] == run_type))
+            for chunk, finished, error in _finished_runs(run_type, ids):
+                for run_id in chunk:
+                    if error is not None:
+                        # the request was already retried - fail these runs rather than poll them forever
+                        outcomes[(run_type, run_id)] = (None, error)
+                    elif run_id in finished:
+                        outcomes[(run_type, run_id)] = (finished[run_id], None)
+
+        now = time.time()
+        resolved = []
+        with self._lock:
+            for run in due:
+                outcome = outcomes.get((run['type'], run['id']))
+                if outcome is not None:
+                    if outcome[0] is not None:
+                        self._record_duration(run, now)
+                    resolved.append((run, outcome))
+                elif self.closed:
+                    # closed while this poll was in flight - nothing will poll the run again
+                    resolved.append((run, (None, None)))
+                else:
+                    self._schedule(run, now)
+
+        for run, (record, error) in resolved:
+            _resolve(run['future'], record, error)
+
+def _resolve(future, record=None, error=None):
+    """Sets the outcome of a run's future - ``record``, ``error``, or cancelled if neither. Does nothing
+    if the future is already done (its caller may cancel it at any time)."""
+
+    if future.done():
+        return
+
+    try:
+        if error is not None:
+            future.set_exception(error)
+        elif record is not None:
+            future.set_result(record)
+        else:
+            future.cancel()
+    except InvalidStateError:
+        # cancelled by its caller since the done() check
+        pass
+
+def _finished_runs(run_type, ids):
+    """Reads the status of runs, with one ``_filter_id__in`` query per 100 ids.
+
+    Args:
+        run_type (string): action_run or playbook_run.
+        ids (list): ids of the runs.
+
+    Yields:
+        tuple: ``(chunk, finished, error)`` per query - the ids it read, ``{id: record}`` of those runs
+        that reached a terminal status, and the exception raised if the query failed (else None).
+    """
+
+    for chunk_start in range(0, len(ids), ph_consts.RUN_STATUS_IDS_PER_QUERY):
+        chunk = ids[chunk_start:chunk_start + ph_consts.RUN_STATUS_IDS_PER_QUERY]
+        finished = {}
+        try:
+            response = ph_base.query(
+                run_type,
+                filters=[{'field': 'id', 'type': 'in', 'value': chunk}],
+                page_size=len(chunk),
+                pretty=False,
+                use_cache=False
+            )
+            if type(response) is not dict or 'data' not in response:
+                raise Exception('Error polling ' + run_type + ' status. Details: ' + str(response))
+
+            requested = set(chunk)
+            for record in response['data']:
+                if record.get('id') in requested and record.get(ph_consts.RUN_STATUS_KEY) in ph_consts.RUN_TERMINAL_STATUSES[run_type]:
+                    finished[record['id']] = record
+        except Exception as err:
+            yield chunk, {}, err
+            continue
+
+        yield chunk, finished, None
+
+class ph_run_handle(object):
+    """Future-like handle of a running action or playbook - returned by ``run(handle=True)``.
+
+    Args:
+        run_type (string): action_run or playbook_run.
+        run_id (int): id of the run.
+        response (dict): response of the request that launched the run.
+        future (concurrent.futures.Future): future of the run, from ``ph_run_scheduler``.
+        cancel_function (function): called with ``run_id`` to cancel the run in phantom.
+
+    Example:
+        Fan out actions and wait for all of them::
+
+            handles = [action.run(handle=True) for action in actions]
+            for handle in handles:
+                print(handle.run_id, handle.result(timeout=300)['status'])
+    """
+
+    def __init__(self, run_type, run_id, response, future, cancel_function):
+        self.run_type = run_type
+        self.run_id = run_id
+        self.response = response
+        self._future = future
+        self._cancel_function = cancel_function
+
+    def result(self, timeout=None):
+        """Waits for the run to finish.
+
+        Keyword Args:
+            timeout (float): seconds to wait. Defaults to None (wait forever).
+
+        Raises:
+            concurrent.futures.TimeoutError: Raised if the run is still going after ``timeout`` seconds.
+            Exception: Raises the exception that stopped the run from being polled.
+
+        Returns:
+            dict: the finished ``action_run``/``playbook_run`` record. Its ``status`` is success, failed
+            or cancelled - a failed run doesn't raise.
+        """
+
+        return self._future.result(timeout)
+
+    def exception(self, timeout=None):
+        """Waits for the run to finish, and returns the exception that stopped it from being polled (or None)."""
+
+        return self._future.exception(timeout)
+
+    def done(self):
+        """Returns True if the run has finished."""
+
+        return self._future.done()
+
+    def cancel(self):
+        """Cancels the run in phantom.
+
+        The handle stays pending until the scheduler sees the run cancelled, then resolves to the
+        run record with status cancelled.
+
+        Raises:
+            Exception: Raises exception if phantom fails to cancel the run.
+
+        Returns:
+            bool: False if the run had already finished, True otherwise.
+        """
+
+        if self._future.done():
+            return False
+
+        return self._cancel_function(self.run_id)
+
+    def add_done_callback(self, callback):
+        """Calls ``callback(handle)`` once the run has finished (right away if it already has)."""
+
+        self._future.add_done_callback(lambda future: callback(self))
@@ -0,0 +1,237 @@
+"""Write-behind buffering of record updates.
+
+Updates given to a ``ph_update_buffer`` are not sent right away. Updates to the same record (e.g. the
+same container) are merged, and the merged update is sent with a single ``ph_base._update_record()``
+call once the record has been waiting for ``window`` seconds, when ``flush()`` is called, or when the
+buffer is closed.
+
+Ordering:
+    - updates to one record are merged in call order - for a field set by several updates, the last
+      value wins. Fields are merged at the top level only (a later ``tags`` list replaces an earlier one).
+    - an update made while an earlier update of the same record is being sent is sent afterwards, in
+      a later request.
+    - updates to different records are independent and may be sent concurrently.
+
+Example:
+    Coalesce the updates made by a correlation engine::
+
+        with ph_update_buffer(window=2.0) as updates:
+            updates.update_container(1052, {'status': 'open'})
+            updates.update_container(1052, {'severity': 'high'})
+            updates.update_container(1052, {'owner_id': 7})
+            # one request: {'status': 'open', 'severity': 'high', 'owner_id': 7}
+"""
+
+import collections
+import threading
+import time
+import traceback
+from phantom_api import ph_base
+from phantom_api import ph_consts
+
+class ph_update_buffer(object):
+    """Merges updates per record and sends them in the background.
+
+    Keyword Args:
+        window (float): seconds an update may wait for more updates of the same record before it is
+            sent. Defaults to 1. None to only send on ``flush()``/``close()``.
+        max_pending (int): number of records with pending updates that triggers an immediate flush.
+            Defaults to 1000.
+        max_concurrency (int): maximum number of update requests in flight during a flush. Defaults to 8.
+        on_error (function): called as ``on_error(record_type, id, data, result)`` for every update
+            that fails in a background flush. ``result`` has ``failed`` set - see ``flush()``. An exception
+            raised by it is printed to stderr and doesn't stop the background flushes.
+
+    Note:
+        Call ``close()`` (or use the buffer as a context manager) before exiting - updates still
+        in the buffer are lost otherwise.
+    """
+
+    def __init__(
+        self,
+        window=ph_consts.UPDATE_BUFFER_DEFAULT_WINDOW,
+        max_pending=ph_consts.UPDATE_BUFFER_DEFAULT_MAX_PENDING,
+        max_concurrency=ph_consts.BATCH_DEFAULT_CONCURRENCY,
+        on_error=None
+    ):
+        self.window = window
+        self.max_pending = max_pending
+        self.max_concurrency = max_concurrency
+        self.on_error = on_error
+        # (record_type, id) -> [first update time, merged data], oldest first
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Condition(threading.Lock())
+        self._flush_lock = threading.Lock()
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, record_type, id, data):
+        """Adds an update of a record to the buffer.
+
+        Args:
+            record_type (string): type of record - e.g. container, artifact
+            id (int): id of the record
+            data (dict): fields to update
+
+        Raises:
+            Exception: Raises exception if the buffer is closed.
+        """
+
+        with self._lock:
+            if self._closed:
+                raise Exception('Update buffer is closed.')
+
+            key = (record_type, id)
+            if key in self._pending:
+                self._pending[key][1].update(data)
+            else:
+                self._pending[key] = [time.time(), dict(data)]
+
+            if len(self._pending) >= self.max_pending:
+                self._flush_requested = True
+            self._start_thread()
+            self._lock.notify()
+
+    def update_container(self, id, container_data):
+        """Buffered version of ``ph_container.update_container()``."""
+
+        self.update('container', id, container_data)
+
+    def update_artifact(self, id, artifact_data):
+        """Buffered version of ``ph_artifact.update_artifact()``."""
+
+        self.update('artifact', id, artifact_data)
+
+    def pending(self):
+        """Returns the number of records with updates waiting to be sent."""
+
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Sends every pending update now, and waits for them.
+
+        Returns:
+            dict: ``(record_type, id)`` -> result of ``_update_record()`` (phantom's response, with
+            ``failed`` set if phantom refused the update), or
+            ``{'id': id, 'created': False, 'failed': True, 'message': details}`` if the request failed.
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                due = list(self._pending.items())
+                self._pending.clear()
+                self._flush_requested = False
+
+            return self._send(due)
+
+    def close(self):
+        """Stops the background flushes and sends the remaining updates.
+
+        Returns:
+            dict: results of the final flush - see ``flush()``.
+        """
+
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+        return self.flush()
+
+    def _start_thread(self):
+        if self._thread is None and (self.window is not None or self.max_pending):
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        """Background thread - sends each record's update once it has waited ``window`` seconds."""
+
+        while True:
+            with self._lock:
+                while not self._closed and not self._has_due():
+                    self._lock.wait(self._wait_time())
+                if self._closed:
+                    return
+
+            # taking and sending under the flush lock keeps a record's updates in order across flushes
+            with self._flush_lock:
+                with self._lock:
+                    due = self._take_due()
+                results = self._send(due)
+
+            if self.on_error is not None:
+                for (record_type, id), merged in due:
+                    result = results[(record_type, id)]
+                    if result.get(ph_consts.RESPONSE_FAILED_KEY):
+                        try:
+                            self.on_error(record_type, id, merged[1], result)
+                        except Exception:
+                            # a broken callback must not end the background flushes
+                            traceback.print_exc()
+
+    def _has_due(self):
+        """True if a flush was requested or the oldest pending update is due. Called with ``_lock`` held."""
+
+        return self._flush_requested or (bool(self._pending) and self._wait_time() == 0.0)
+
+    def _take_due(self):
+        """Removes and returns the pending updates that are due. Called with ``_lock`` held."""
+
+        if self._flush_requested:
+            self._flush_requested = False
+            due = list(self._pending.items())
+            self._pending.clear()
+            return due
+
+        due = []
+        if self.window is None:
+            return due
+
+        deadline = time.time() - self.window
+        while self._pending:
+            key, merged = next(iter(self._pending.items()))
+            if merged[0] > deadline:
+                break
+            due.append((key, merged))
+            del self._pending[key]
+
+        return due
+
+    def _wait_time(self):
+        """Seconds until the oldest pending update is due (None to wait for a notify)."""
+
+        if not self._pending or self.window is None:
+            return None
+
+        oldest = next(iter(self._pending.values()))[0]
+
+        return max(0.0, oldest + self.window - time.time())
+
+    def _send(self, due):
+        """Sends merged updates. Called with ``_flush_lock`` held."""
+
+        if not due:
+            return {}
+
+        def send(entry):
+            (record_type, id), merged = entry
+            try:
+                return ph_base._update_record(record_type, id, merged[1])
+            except Exception as err:
+                result = ph_base._failed_result(err)
+                result['id'] = id
+                return result
+
+        results = ph_base._map_concurrently(send, due, max_concurrency=self.max_concurrency)
+
+        return dict(zip([key for key, _ in due], results))
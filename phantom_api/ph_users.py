@@ -1,5 +1,4 @@
 from datetime import datetime
-import json
 from phantom_api import ph_base
 from phantom_api import ph_consts
 
@@ -113,7 +112,7 @@ class ph_user(object):
         response = ph_base._send_request(
             '/rest/ph_user',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
@@ -190,7 +189,7 @@ class ph_user(object):
         response = ph_base._send_request(
             '/rest/ph_user/' + str(user_id),
             'post',
-            payload=json.dumps(update_json),
+            payload=ph_base._dumps(update_json),
             content_type='application/json'
         )
 
@@ -334,7 +333,7 @@ class ph_role(object):
         response = ph_base._send_request(
             '/rest/role',
             'post',
-            payload=json.dumps(self.render_dictionary()),
+            payload=ph_base._dumps(self.render_dictionary()),
             content_type='application/json'
         )
 
@@ -384,7 +383,7 @@ class ph_role(object):
         response = ph_base._send_request(
             '/rest/role/' + str(role_id),
             'post',
-            payload=json.dumps(update_json),
+            payload=ph_base._dumps(update_json),
             content_type='application/json'
         )
 
@@ -0,0 +1,100 @@
+"""Tests of ph_run_scheduler's handling of futures resolved, cancelled or closed while a poll is in flight.
+
+``ph_base.query`` is replaced by a fake that blocks until the test releases it, so the race can be set
+up deterministically.
+"""
+
+import threading
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from phantom_api import ph_scheduler
+
+WAIT = 5.0
+
+class _blocking_query(object):
+    """Stands in for ``ph_base.query``: each call waits for ``release`` then returns (or raises) the next outcome."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.called = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, run_type, filters=[], **kwargs):
+        self.called.set()
+        self.release.wait(WAIT)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        return {'data': [dict(record, id=run_id) for run_id in filters[0]['value'] for record in [outcome]]}
+
+class ph_run_scheduler_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = ph_scheduler.ph_run_scheduler(min_interval=0.01, max_interval=0.05, expected_duration=0.01)
+
+    def tearDown(self):
+        self.scheduler.close()
+
+    def test_cancel_during_failing_poll_keeps_tracking(self):
+        query = _blocking_query([Exception('phantom unreachable'), {'status': 'success'}])
+        with mock.patch('phantom_api.ph_base.query', query):
+            cancelled = self.scheduler.track_action(1)
+            self.assertTrue(query.called.wait(WAIT))
+            self.assertTrue(cancelled.cancel())
+            query.release.set()
+
+            # the poll failed for a future its caller had cancelled - the thread must survive it
+            tracked = self.scheduler.track_action(2)
+            self.assertEqual(tracked.result(WAIT)['status'], 'success')
+            self.assertTrue(cancelled.cancelled())
+
+    def test_cancel_during_successful_poll(self):
+        query = _blocking_query([{'status': 'success'}])
+        with mock.patch('phantom_api.ph_base.query', query):
+            cancelled = self.scheduler.track_action(1)
+            self.assertTrue(query.called.wait(WAIT))
+            cancelled.cancel()
+            query.release.set()
+
+            self.assertEqual(self.scheduler.track_playbook(3).result(WAIT)['status'], 'success')
+
+    def test_close_during_poll_cancels_unfinished_runs(self):
+        query = _blocking_query([{'status': 'running'}])
+        with mock.patch('phantom_api.ph_base.query', query):
+            future = self.scheduler.track_action(1)
+            self.assertTrue(query.called.wait(WAIT))
+
+            closer = threading.Thread(target=self.scheduler.close)
+            closer.start()
+            query.release.set()
+            closer.join(WAIT)
+
+            self.assertFalse(closer.is_alive())
+            self.assertTrue(future.cancelled())
+
+    def test_close_during_poll_resolves_finished_runs(self):
+        query = _blocking_query([{'status': 'failed'}])
+        with mock.patch('phantom_api.ph_base.query', query):
+            future = self.scheduler.track_action(1)
+            self.assertTrue(query.called.wait(WAIT))
+
+            closer = threading.Thread(target=self.scheduler.close)
+            closer.start()
+            query.release.set()
+            closer.join(WAIT)
+
+            self.assertEqual(future.result(0)['status'], 'failed')
+
+    def test_poll_error_fails_the_run(self):
+        query = _blocking_query([Exception('phantom unreachable')])
+        query.release.set()
+        with mock.patch('phantom_api.ph_base.query', query):
+            future = self.scheduler.track_action(1)
+            self.assertEqual(str(future.exception(WAIT)), 'phantom unreachable')
+
+if __name__ == '__main__':
+    unittest.main()